@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+Generate synthetic keynotes, using every slide type.
+
+Usage: python3 benchmarks/deckgen.py [options] output.key
+
+The size of the deck, the mix of slide types, the nesting of item lists,
+the amount of formatted text and the use of transitions are configurable,
+and the same options (and seed) always generate the same deck. Images
+refer to the images bundled with KeynoteC, so generated keynotes can be
+compiled from any directory.
+"""
+
+import random
+import sys
+
+SLIDE_TYPES = ['bigtitle', 'citation', 'bigimage', 'twoimages',
+               'fourimages', 'code', 'items', 'items+image']
+
+IMAGES = ['images/Tuxgaucho.png', 'images/senac.png',
+          'images/chalkboard.jpg', 'images/film_strip.png']
+
+LANGUAGES = ['python', 'swift']
+
+TRANSITIONS = ['dissolve', 'pushright', 'pushleft', 'covertop',
+               'coverbottom']
+
+FORMATTERS = ['*', '/', '_', '|']
+
+WORDS = ("keynote slide latex parser cache format theme image item list "
+         "code title author build render page frame style").split()
+
+HEADER = """theme: tchelinux
+title: Synthetic Keynote
+subtitle: {count} slides
+author: KeynoteC Benchmarks
+date: 2019-08-01
+slidenumber: right bottom
+
+:coverpage
+
+"""
+
+
+class DeckGenerator:
+    """
+    Generate keynote sources with a given mix of slides.
+
+    `mix` maps slide types to their relative frequency (by default, all
+    types are equally frequent). Item lists are nested up to `depth`
+    levels, a fraction `formatting` of the words in text is formatted, and
+    a fraction `transitions` of the slides have a transition.
+    """
+
+    def __init__(self, mix=None, depth=4, formatting=0.3, transitions=0.2,
+                 seed=0):
+        """Initialize the generator."""
+        mix = mix or {name: 1 for name in SLIDE_TYPES}
+        for name in mix:
+            if name not in SLIDE_TYPES:
+                raise Exception("Invalid slide type: {}".format(name))
+        self.types = list(mix.keys())
+        self.weights = list(mix.values())
+        self.depth = depth
+        self.formatting = formatting
+        self.transitions = transitions
+        self.random = random.Random(seed)
+
+    def text(self, words=6):
+        """Return a line of text, with some formatted words."""
+        result = []
+        for _ in range(words):
+            word = self.random.choice(WORDS)
+            if self.random.random() < self.formatting:
+                mark = self.random.choice(FORMATTERS)
+                word = "{0}{1}{0}".format(mark, word)
+            result.append(word)
+        return " ".join(result)
+
+    def items(self, count=6):
+        """Return an item list, nested up to the generator depth."""
+        lines = []
+        level = 0
+        for i in range(count):
+            # the first item has the smallest indentation.
+            if i > 0:
+                step = self.random.choice([-1, 0, 1])
+                level = max(0, min(self.depth - 1, level + step))
+            marker = "*" if level % 2 == 0 else "-"
+            lines.append("    {}{} {}\n".format("    " * level, marker,
+                                                self.text()))
+        return "".join(lines)
+
+    def image(self):
+        """Return an image reference."""
+        return "[{}]\n".format(self.random.choice(IMAGES))
+
+    def code(self, lines=8):
+        """Return a code block."""
+        body = "".join("    value_{0} = compute({0})  # {1}\n".format(
+            i, self.random.choice(WORDS)) for i in range(lines))
+        return "```{}\n{}```\n".format(self.random.choice(LANGUAGES), body)
+
+    def slide(self, type):
+        """Return the source of a slide of the given type."""
+        header = ":{}\n".format(type)
+        if self.random.random() < self.transitions:
+            transition = self.random.choice(TRANSITIONS)
+            duration = self.random.choice([0.5, 1, 1.5])
+            header = ":({}, {}){}".format(transition, duration, header)
+        title = "# {}\n".format(self.text(4))
+        if type == 'bigtitle':
+            body = title
+        elif type == 'citation':
+            body = title + "-- {}\n".format(self.text(3))
+        elif type == 'bigimage':
+            body = self.image()
+        elif type == 'twoimages':
+            body = self.image() + self.image()
+        elif type == 'fourimages':
+            body = "".join(self.image() for _ in range(4))
+        elif type == 'code':
+            body = title + self.code()
+        elif type == 'items':
+            body = title + self.items()
+        else:
+            body = title + self.image() + self.items()
+        return header + body + "\n"
+
+    def deck(self, count):
+        """Return the source of a keynote with `count` slides (and cover)."""
+        types = self.random.choices(self.types, self.weights, k=count)
+        return HEADER.format(count=count) + \
+            "".join(self.slide(type) for type in types)
+
+
+def parse_mix(text):
+    """Parse a slide mix given as 'type=weight,...'."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    """Write a synthetic keynote."""
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description="Generate a synthetic keynote.")
+    parser.add_argument("output", help="keynote file to write.")
+    parser.add_argument("-n", "--slides", type=int, default=100,
+                        help="number of slides (default: 100).")
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="slide types and their relative frequency, as"
+                             " 'items=3,code=1' (default: all types, with"
+                             " the same frequency).")
+    parser.add_argument("--depth", type=int, default=4,
+                        help="maximum nesting of item lists (default: 4).")
+    parser.add_argument("--formatting", type=float, default=0.3,
+                        help="fraction of formatted words (default: 0.3).")
+    parser.add_argument("--transitions", type=float, default=0.2,
+                        help="fraction of slides with transitions"
+                             " (default: 0.2).")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default: 0).")
+    args = parser.parse_args()
+    generator = DeckGenerator(args.mix, args.depth, args.formatting,
+                              args.transitions, args.seed)
+    with open(args.output, 'wt') as output:
+        output.write(generator.deck(args.slides))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
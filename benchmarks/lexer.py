@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+Measure the lexer functions of the parser.
+
+Usage: python3 benchmarks/lexer.py [repeat]
+
+Every lexer function is timed on a typical input, and compared with a
+reference implementation scanning the input one character at a time in
+Python, as the parser did before using precompiled tables.
+"""
+
+import os
+import sys
+import timeit
+from string import ascii_letters, digits, whitespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from keynotec import parser  # noqa: E402
+from parse_scaling import synthetic_deck  # noqa: E402
+
+
+def reference_skip_space(data):
+    """Skip white space, one character at a time."""
+    content, i, line = data
+    while i < len(content) and content[i] in whitespace:
+        if content[i] == '\n':
+            line += 1
+        i += 1
+    return (content, i, line)
+
+
+def reference_next_token(data):
+    """Extract a token, building the character set for every character."""
+    letters = {c for c in ascii_letters}
+    numbers = {d for d in digits}
+    content, start, line = reference_skip_space(data)
+    i = start
+    while i < len(content) and content[i] in (letters | numbers):
+        i += 1
+    return content[start:i].strip(), (content, i, line)
+
+
+def reference_find_slide_end(content, start):
+    """Find the end of a slide, checking every line in Python."""
+    code = False
+    i = content.find('\n', start)
+    while 0 <= i < len(content):
+        i += 1
+        end = content.find('\n', i)
+        text = content[i:end if end >= 0 else len(content)].lstrip(' \t')
+        if code:
+            code = '```' not in text
+        elif text.startswith('```'):
+            code = True
+        elif text.startswith(':'):
+            return i
+        i = end
+    return len(content)
+
+
+def reference_indentation(data):
+    """Count the indentation of an item, one space at a time."""
+    content, i, line = data
+    level = 0
+    while i + level < len(content) and content[i + level] == " ":
+        level += 1
+    return level
+
+
+def indentation(data):
+    """Count the indentation of an item, as parse_singleitem does."""
+    content, i, line = data
+    return parser.indentation.match(content, i).end() - i
+
+
+def reference_dispatch(type):
+    """Look up a slide parser, building the dispatch table every time."""
+    slide_parser = {
+        'coverpage': parser.parse_slide_coverpage,
+        'bigtitle': parser.parse_slide_bigtitle,
+        'citation': parser.parse_slide_citation,
+        'bigimage': parser.parse_slide_bigimage,
+        'twoimages': parser.parse_slide_twoimages,
+        'fourimages': parser.parse_slide_fourimages,
+        'code': parser.parse_slide_code,
+        'items': parser.parse_slide_items,
+        'items+image': parser.parse_slide_itemimage,
+    }
+    return slide_parser[type]
+
+
+def dispatch(type):
+    """Look up a slide parser in the table built on import."""
+    return parser.slide_parsers[type]
+
+
+CODE = ":code\n```python\n" + "x = 1\n" * 200 + "```\n\n:bigtitle\n# End\n"
+
+CASES = [
+    ("skip_space", reference_skip_space, parser.skip_space,
+     ("   \n\t\n" * 20 + "text", 0, 1)),
+    ("next_token", reference_next_token, parser.next_token,
+     ("  language: english\n", 0, 1)),
+    ("find_slide_end", reference_find_slide_end, parser.find_slide_end,
+     CODE, 0),
+    ("item indentation", reference_indentation, indentation,
+     (" " * 12 + "* item\n", 0, 1)),
+    ("slide dispatch", reference_dispatch, dispatch, 'items+image'),
+]
+
+
+def measure(function, args, repeat):
+    """Return the best time, in microseconds, of a call to `function`."""
+    timer = timeit.Timer(lambda: function(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def main(repeat=5):
+    """Print the time of each lexer function, and of its reference."""
+    row = "{:<20} {:>16} {:>16} {:>10}"
+    print(row.format("function", "reference (us)", "current (us)",
+                     "speedup"))
+    for name, reference, current, *args in CASES:
+        assert reference(*args) == current(*args), name
+        before = measure(reference, args, repeat)
+        after = measure(current, args, repeat)
+        print("{:<20} {:>16.3f} {:>16.3f} {:>9.1f}x".format(
+            name, before, after, before / after))
+    source = synthetic_deck(1000)
+    deck = timeit.Timer(lambda: parser.parse_keynote((source, 1)))
+    number, _ = deck.autorange()
+    elapsed = min(deck.repeat(repeat, number)) / number
+    print()
+    print("parse_keynote, 1000 slides: {:.2f}ms".format(elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
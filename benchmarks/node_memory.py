@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""
+Measure the memory used by the slides of a parsed keynote.
+
+Usage: python3 benchmarks/node_memory.py [slides]
+
+A synthetic keynote (see deckgen.py) with 100000 slides, by default, is
+parsed, and the memory allocated by Python to keep its slides as nodes
+(see `keynotec.nodes`), as the parser does, is compared to the memory of
+keeping them as the type and LaTeX code of every slide, as the parser did
+before the LaTeX code was rendered when the document is generated.
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from keynotec.parser import Keynote, parse_slides, split_slides  # noqa: E402
+from keynotec.render import render_slide  # noqa: E402
+from deckgen import DeckGenerator  # noqa: E402
+
+
+def allocated(function, *args):
+    """Return the result of a call, and the memory it left allocated."""
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def parse(source):
+    """Return the nodes of the slides of a keynote source."""
+    return list(parse_slides(Keynote(), split_slides(source)))
+
+
+def render(source):
+    """Return the type and LaTeX code of the slides of a keynote source."""
+    return [(node.type, render_slide(node))
+            for node in parse_slides(Keynote(), split_slides(source))]
+
+
+def main(count=100000):
+    """Print the memory used by the slides of a synthetic keynote."""
+    count = int(count)
+    source = DeckGenerator().deck(count)
+    slides, slide_memory = allocated(render, source)
+    nodes, node_memory = allocated(parse, source)
+    assert slides == [(node.type, render_slide(node)) for node in nodes]
+    row = "{:>12} {:>12} {:>16}"
+    print(row.format("slides", "total (KB)", "per slide (B)"))
+    for name, memory in (("latex", slide_memory), ("nodes", node_memory)):
+        print(row.format(name, memory // 1024, memory // len(nodes)))
+    print("Nodes use {:.0%} of the memory of the LaTeX code.".format(
+        node_memory / slide_memory))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""
+Measure how parse_keynote scales with the number of slides.
+
+Usage: python3 benchmarks/parse_scaling.py [max_slides]
+
+Synthetic decks from 10 up to `max_slides` (default: 100000) slides are
+parsed, and the time per slide is reported. With a linear parser, the time
+per slide should be roughly constant for all deck sizes.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from keynotec.parser import parse_keynote  # noqa: E402
+
+HEADER = """theme: tchelinux
+title: Benchmark
+author: KeynoteC
+
+:coverpage
+
+"""
+
+SLIDES = [
+    """:bigtitle
+# A *big* title.
+
+""",
+    """:(dissolve):items
+# Some items
+    * First /level/
+        - Second _level_
+    * Back to |first|
+
+""",
+    """:code
+# Some code
+```python
+def sample():
+    return {"key": "value"}
+```
+
+""",
+    """:(pushleft, 1.0):twoimages
+[images/Tuxgaucho.png]
+[images/Tuxgaucho.png]
+
+""",
+]
+
+
+def synthetic_deck(count):
+    """Create a keynote source with `count` slides."""
+    return HEADER + "".join(SLIDES[i % len(SLIDES)] for i in range(count))
+
+
+def measure(count):
+    """Return the time, in seconds, to parse a deck with `count` slides."""
+    source = synthetic_deck(count)
+    start = time.perf_counter()
+    keynote = parse_keynote((source, 1))
+    elapsed = time.perf_counter() - start
+    assert len(keynote.nodes) == count + 1
+    return elapsed
+
+
+def main(max_slides=100000):
+    """Print parsing time for increasing deck sizes."""
+    print("{:>10} {:>12} {:>16}".format("slides", "seconds", "usec/slide"))
+    count = 10
+    while count <= max_slides:
+        elapsed = measure(count)
+        per_slide = elapsed / count * 1e6
+        print("{:>10} {:>12.4f} {:>16.2f}".format(count, elapsed, per_slide))
+        count *= 10
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
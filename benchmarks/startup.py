@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+Check that starting KeynoteC stays fast.
+
+Usage: python3 benchmarks/startup.py [max_ms] [runs]
+
+The time to import the keynotec package is measured with `-X importtime`
+on `runs` (default: 10) fresh interpreters, and the slowest modules it
+imports are listed, along with the time to run `keynotec --help`. The
+check fails (exit status 1) if the median import time is larger than
+`max_ms` milliseconds (default: 50), or if a module known to be slow to
+import, like 'pkg_resources', is imported.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# modules that must not be imported when keynotec starts.
+FORBIDDEN = ['pkg_resources', 'asyncio', 'PIL', 'pypdf', 'pygments']
+
+
+def _environment():
+    """Return the environment to run keynotec from this source tree."""
+    env = dict(os.environ)
+    paths = [ROOT] + [p for p in [env.get('PYTHONPATH')] if p]
+    env['PYTHONPATH'] = os.pathsep.join(paths)
+    return env
+
+
+def import_times():
+    """
+    Import keynotec on a fresh interpreter, with `-X importtime`.
+
+    Return a list of (module, self, cumulative), with times in
+    microseconds, for every module imported by keynotec.
+    """
+    cmd = [sys.executable, '-X', 'importtime', '-c', 'import keynotec']
+    result = subprocess.run(cmd, stderr=subprocess.PIPE, env=_environment(),
+                            universal_newlines=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(own), int(cumulative)))
+    # modules are reported after their dependencies, so keep the ones
+    # imported after the interpreter startup, up to keynotec.
+    names = [name for name, _, _ in modules]
+    start = names.index('site') + 1 if 'site' in names else 0
+    return modules[start:names.index('keynotec') + 1]
+
+
+def help_time():
+    """Return the time, in seconds, to run 'keynotec --help'."""
+    cmd = [sys.executable, '-m', 'keynotec', '--help']
+    start = time.perf_counter()
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, env=_environment())
+    return time.perf_counter() - start
+
+
+def main(max_ms=50, runs=10):
+    """Report startup times, and return 1 if they regressed."""
+    totals = []
+    for _ in range(runs):
+        modules = import_times()
+        totals.append(modules[-1][2] / 1000)
+    median = statistics.median(totals)
+    print("import keynotec: {:.1f}ms (median of {} runs)".format(median,
+                                                                 runs))
+    print("keynotec --help: {:.1f}ms".format(help_time() * 1000))
+    print()
+    print("{:<40} {:>10}".format("slowest imports", "self (ms)"))
+    for name, own, _ in sorted(modules, key=lambda m: -m[1])[:10]:
+        print("{:<40} {:>10.2f}".format(name, own / 1000))
+
+    failed = False
+    imported = [name for name, _, _ in modules]
+    for name in FORBIDDEN:
+        if any(module == name or module.startswith(name + '.')
+               for module in imported):
+            print("FAIL: '{}' is imported on startup.".format(name))
+            failed = True
+    if median > max_ms:
+        print("FAIL: import takes longer than {}ms.".format(max_ms))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*map(int, sys.argv[1:3])))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+Measure the memory used to parse large keynote files.
+
+Usage: python3 benchmarks/stream_memory.py [slides...]
+
+Synthetic keynotes with long code listings (see deckgen.py) are written to
+temporary files, and the peak memory allocated by Python to generate their
+LaTeX documents is measured, reading the whole keynote at once, and
+streaming it one slide at a time, as `keynotec.build` does. The peak of
+the streaming parse should stay about the same as keynotes grow.
+"""
+
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import keynotec  # noqa: E402
+from keynotec.dedup import SlideWriter  # noqa: E402
+from deckgen import DeckGenerator  # noqa: E402
+
+
+class LongCode(DeckGenerator):
+    """Generate keynotes with long code listings."""
+
+    def code(self, lines=400):
+        """Return a long code block."""
+        return super().code(lines)
+
+
+def peak_memory(function, *args):
+    """Return the peak memory, in bytes, allocated by Python in a call."""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def whole(filename):
+    """Read and parse a keynote at once, and generate its document."""
+    with open(filename, 'rt') as datafile:
+        keynote = keynotec._load_keynote(datafile.read(),
+                                         highlight=False)
+    with open(os.devnull, 'wt') as output:
+        keynotec._generate_tex(keynote, output)
+
+
+def streaming(filename):
+    """Parse a keynote one slide at a time, and generate its document."""
+    with open(filename, 'rt') as datafile, \
+            tempfile.TemporaryFile('w+t') as slides:
+        writer = SlideWriter(slides)
+        keynote = keynotec._read_keynote(datafile, writer, highlight=False)
+        with open(os.devnull, 'wt') as output:
+            keynotec._generate_tex(keynote, output, slides=slides)
+
+
+def main(*sizes):
+    """Print the peak memory of both parses, for every keynote size."""
+    sizes = [int(size) for size in sizes] or [100, 1000, 5000]
+    row = "{:>8} {:>12} {:>14} {:>16}"
+    print(row.format("slides", "file (KB)", "whole (KB)", "streaming (KB)"))
+    for count in sizes:
+        fd, filename = tempfile.mkstemp(suffix='.key')
+        try:
+            with os.fdopen(fd, 'wt') as output:
+                output.write(LongCode({'code': 1, 'items': 1}).deck(count))
+            print(row.format(count, os.path.getsize(filename) // 1024,
+                             peak_memory(whole, filename) // 1024,
+                             peak_memory(streaming, filename) // 1024))
+        finally:
+            os.unlink(filename)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+"""
+Run the KeynoteC benchmark suite.
+
+Usage: python3 benchmarks/suite.py [options]
+
+Synthetic keynotes (see deckgen.py) of increasing sizes are parsed, their
+LaTeX documents are generated, and, if xelatex is installed, they are
+compiled into PDF presentations. The time and peak memory of each step are
+printed, and can be saved as JSON with `--output`. Results from another
+version can be compared with `--compare`, which fails (exit status 1) if
+any step became slower than the given tolerance.
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import keynotec  # noqa: E402
+from keynotec.parser import parse_keynote  # noqa: E402
+from deckgen import DeckGenerator, parse_mix  # noqa: E402
+
+
+def best_time(function, repeat):
+    """Return the best wall time, in seconds, of `repeat` calls."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(function):
+    """Return the peak memory, in bytes, allocated by Python in a call."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def children_max_rss():
+    """Return the largest resident set size of child processes, in bytes."""
+    import resource
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+
+def benchmark_deck(source, count, repeat, end_to_end):
+    """Measure every step for a keynote source, returning named results."""
+    results = {}
+
+    def parse():
+        return parse_keynote((source, 1))
+
+    results['parse/{}'.format(count)] = {
+        'seconds': best_time(parse, repeat),
+        'peak_bytes': peak_memory(parse),
+    }
+
+    keynote = keynotec._load_keynote(source)
+
+    def generate():
+        keynotec._generate_tex(keynote, io.StringIO())
+
+    results['generate/{}'.format(count)] = {
+        'seconds': best_time(generate, repeat),
+        'peak_bytes': peak_memory(generate),
+    }
+
+    if end_to_end:
+        workdir = tempfile.mkdtemp(prefix='keynotec-bench-')
+        try:
+            filename = os.path.join(workdir, 'deck.key')
+            with open(filename, 'wt') as output:
+                output.write(source)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                pdffile = keynotec.build(filename, progress=None)
+            elapsed = time.perf_counter() - start
+            results['build/{}'.format(count)] = {
+                'seconds': elapsed,
+                'peak_bytes': children_max_rss(),
+                'pdf_bytes': os.path.getsize(pdffile) if pdffile else None,
+            }
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def run_suite(sizes, mix=None, repeat=3, end_to_end=None):
+    """Run the benchmarks for every deck size, returning a report."""
+    if end_to_end is None:
+        end_to_end = shutil.which('xelatex') is not None
+    results = {}
+    for count in sizes:
+        source = DeckGenerator(mix).deck(count)
+        results.update(benchmark_deck(source, count, repeat, end_to_end))
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'sizes': sizes,
+        'mix': mix,
+        'end_to_end': end_to_end,
+        'results': results,
+    }
+
+
+def print_report(report):
+    """Print the results of a benchmark run."""
+    row = "{:<20} {:>12} {:>14}"
+    print(row.format("benchmark", "seconds", "peak (KB)"))
+    for name, result in report['results'].items():
+        print(row.format(name, "{:.4f}".format(result['seconds']),
+                         result['peak_bytes'] // 1024))
+    if not report['end_to_end']:
+        print("(xelatex not found: builds were not measured)")
+
+
+def compare(report, baseline, tolerance):
+    """Compare results with a baseline, returning the number regressed."""
+    row = "{:<20} {:>12} {:>12} {:>8}"
+    print(row.format("benchmark", "baseline", "current", "ratio"))
+    regressions = 0
+    for name, result in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['seconds']
+        ratio = result['seconds'] / before if before else float('inf')
+        mark = ""
+        if ratio > 1 + tolerance:
+            mark = " slower"
+            regressions += 1
+        print(row.format(name, "{:.4f}".format(before),
+                         "{:.4f}".format(result['seconds']),
+                         "{:.2f}".format(ratio)) + mark)
+    return regressions
+
+
+def main():
+    """Run the benchmark suite."""
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description="Run the KeynoteC benchmarks.")
+    parser.add_argument("--sizes", default="10,100,1000,10000",
+                        help="comma separated deck sizes, in slides"
+                             " (default: 10,100,1000,10000).")
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="slide types and their relative frequency, as"
+                             " 'items=3,code=1'.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of each benchmark, the best is kept"
+                             " (default: 3).")
+    parser.add_argument("--no-build", action="store_true",
+                        help="do not compile the decks with xelatex.")
+    parser.add_argument("--output", metavar="JSON",
+                        help="save the results to a JSON file.")
+    parser.add_argument("--compare", metavar="JSON",
+                        help="compare the results with a saved run.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="accepted slowdown when comparing"
+                             " (default: 0.2).")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = run_suite(sizes, args.mix, args.repeat,
+                       False if args.no_build else None)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'wt') as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare, 'rt') as saved:
+            baseline = json.load(saved)
+        print()
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
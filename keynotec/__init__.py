@@ -2,8 +2,10 @@
 
 import sys
 import os.path
-import pkg_resources
-import re
+from functools import lru_cache
+
+from keynotec.profile import phase
+from keynotec import xelatex
 
 metabase = {
     'theme': "",
@@ -18,25 +20,11 @@ metabase = {
     }
 
 
-def _run_xelatex(texfile):
-    from subprocess import Popen, PIPE, STDOUT
-    import os
-    env = dict(os.environ)
-    resources_dir = pkg_resources.resource_filename('keynotec', 'resources')
-    env['TEXINPUTS'] = resources_dir + "//:"
-    cmd = ['xelatex', '-interaction', 'nonstopmode', texfile]
-    proc = Popen(cmd, stdout=PIPE, stderr=STDOUT,
-                 universal_newlines=True, env=env)
-    error = False
-    for stream in proc.communicate():
-        for line in stream.split('\n') if stream else []:
-            if line and line[0] == '!':
-                error = True
-                print(line)
-            if line:
-                for slide in re.findall(re.compile('\[(\d+)\]'), line):
-                    print("Processing slide {}".format(slide))
-    return error
+@lru_cache(maxsize=None)
+def resources_dir():
+    """Return the directory with the LaTeX resources used by keynotes."""
+    from importlib.resources import files
+    return str(files('keynotec') / 'resources')
 
 
 def _generate_pagenumber(keynote, output):
@@ -61,64 +49,618 @@ def _generate_fullscreen(keynote, output):
         output.write('\\hypersetup{pdfpagemode=FullScreen}')
 
 
-def run():
-    """Run KeynoteC."""
+def _generate_preamble(keynote, output):
+    """Write the part of the preamble shared by keynotes with same style."""
+    preamble = os.path.join(resources_dir(), 'preamble.inc')
+    output.write("\\input{presentation}")
+    with open(preamble, 'rt') as style:
+        output.write(style.read().format(**keynote.metadata))
+    for plugin in sorted(keynote.plugins):
+        output.write("\\input{{{plugin}}}".format(plugin=plugin))
+
+
+def _generate_tex(keynote, output, preamble=True, first=0, last=None,
+                  slides=None, cache=None, profiler=None):
+    """
+    Write the LaTeX document for a keynote.
+
+    If `preamble` is False, the style preamble is not written, and the
+    document must be compiled with a precompiled format. Only the slides
+    from `first` up to (not including) `last` are written, numbered as in
+    the whole keynote. If a `slides` file is given, the LaTeX code of the
+    slides is copied from it, otherwise it is rendered from the keynote
+    nodes, reusing highlighted code from the `cache`, and the rendering of
+    each slide is recorded if a `keynotec.profile.Profiler` is given.
+    Repeated slides are written once (see `keynotec.dedup`).
+    """
+    from keynotec.dedup import SlideWriter
+    metafile = os.path.join(resources_dir(), 'metadata.inc')
+    if preamble:
+        _generate_preamble(keynote, output)
+    with open(metafile, 'rt') as meta:
+        output.write(meta.read().format(**keynote.metadata))
+    _generate_pagenumber(keynote, output)
+    _generate_fullscreen(keynote, output)
+    if keynote.highlight is not None:
+        from keynotec.highlight import style_defs
+        output.write(style_defs(keynote.highlight))
+    # print slides
+    output.write('\\begin{document}')
+    if first > 0:
+        counters = '\\setcounter{{framenumber}}{{{}}}' \
+            '\\setcounter{{page}}{{{}}}'
+        output.write(counters.format(first, first + 1))
+    if slides is None:
+        writer = SlideWriter(output)
+        nodes = keynote.nodes[first:last]
+        for slide in _render_slides(keynote, nodes, cache,
+                                    keynote.highlight is not None,
+                                    profiler, first):
+            writer.write(slide)
+    else:
+        import shutil
+        slides.seek(0)
+        shutil.copyfileobj(slides, output)
+    output.write('\\end{document}')
+
+
+def _precompiled_format(cache, keynote):
+    """
+    Return the path to a format with the keynote preamble preloaded.
+
+    The format is built on the first use of a combination of theme,
+    language and plugins, and rebuilt whenever a resource file, or xelatex,
+    changes. If the format cannot be built (for example, because fonts
+    loaded by the theme cannot be dumped), None is returned, and further
+    attempts are not made until something changes.
+    """
+    import shutil
+    from subprocess import run, DEVNULL
+    from keynotec import workspace
+    from keynotec.cache import file_signature, tree_signature
+    binary = shutil.which('xelatex')
+    if binary is None:
+        return None
+    style = [keynote.metadata['theme'], keynote.metadata['language']]
+    key = cache.key('format', file_signature(binary),
+                    tree_signature(resources_dir()),
+                    *(style + sorted(keynote.plugins)))
+    fmtkey = key + '.fmt'
+    if cache.touch(fmtkey):
+        return cache.path(fmtkey)
+    if cache.touch(key + '.failed'):
+        return None
+
+    print("Precompiling presentation style.")
+    workdir = workspace.create()
+    try:
+        with open(os.path.join(workdir, key + '.tex'), 'wt') as output:
+            _generate_preamble(keynote, output)
+            output.write('\\dump')
+        cmd = ['xelatex', '-ini', '-interaction', 'nonstopmode',
+               '-jobname={}'.format(key), '&xelatex', key + '.tex']
+        run(cmd, stdout=DEVNULL, stderr=DEVNULL, cwd=workdir,
+            env=xelatex.environment())
+        try:
+            with open(os.path.join(workdir, fmtkey), 'rb') as fmt:
+                cache.put(fmtkey, fmt.read())
+        except OSError:
+            print("Presentation style cannot be precompiled.")
+            cache.put(key + '.failed', b'')
+            return None
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return cache.path(fmtkey)
+
+
+def _image_signatures(images, workdir):
+    """Return signatures for the images used in a keynote."""
+    from keynotec.cache import file_signature
+    signatures = []
+    for image in sorted(images):
+        # graphicx allows the file extension to be omitted.
+        exts = [''] if os.path.splitext(image)[1] else \
+            ['.pdf', '.png', '.jpg', '.jpeg']
+        for directory in (workdir, resources_dir()):
+            for ext in exts:
+                path = os.path.join(directory, image + ext)
+                signatures.append(file_signature(path))
+    return signatures
+
+
+def _document_key(cache, keynote, texfile, srcdir, fmt=None,
+                  image_width=0):
+    """Compute the cache key for the PDF generated from a LaTeX file."""
+    from keynotec.cache import file_digest, tree_signature
+    return cache.key('pdf', file_digest(texfile), fmt or "", str(image_width),
+                     tree_signature(resources_dir()),
+                     *_image_signatures(keynote.images, srcdir))
+
+
+def _load_keynote(source, profiler=None, highlight=False):
+    """Parse a keynote source, filling in the default metadata."""
     from keynotec.parser import parse_keynote
-    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
-        themes = {
-            "apple_keynote_black": "Inspired by Apple Keynotes.",
-            "tchelinux": "A theme with Tux Gaudério.",
-            "chalkboard": "Reminder of your boring classes.",
-            "photographie": "A filmstrip background."
-        }
-        print("usage: keynotec <filename>")
-        print("\nAvailable Themes:")
-        for k, v in themes.items():
-            print("\t{:>20}\t{}".format(k, v))
-        sys.exit(1 if len(sys.argv) < 2 else 0)
+    keynote = parse_keynote((source, 1), profiler)
+    if keynote is None:
+        raise Exception("Failed to load keynote data.")
+    _use_highlight(keynote, highlight)
+    _default_metadata(keynote)
+    return keynote
+
+
+def _read_keynote(datafile, writer=None, cache=None, profiler=None,
+                  highlight=False):
+    """
+    Parse a keynote file one slide at a time, filling in default metadata.
+
+    The file is read in chunks. If a `writer` is given (see
+    `keynotec.dedup.SlideWriter`), every slide is rendered and written with
+    it as soon as it is parsed, instead of being kept in the keynote, so
+    that memory use is bounded by the largest slide, not by the keynote
+    size.
+    """
+    from keynotec.parser import Keynote, parse_slides, read_slides
+    keynote = Keynote()
+    nodes = parse_slides(keynote, read_slides(datafile), profiler)
+    if writer is None:
+        keynote.nodes.extend(nodes)
+        _use_highlight(keynote, highlight)
+    else:
+        for slide in _render_slides(keynote, nodes, cache, highlight,
+                                    profiler):
+            writer.write(slide)
+        # the style of highlighted code was chosen while rendering.
+        _use_highlight(keynote, keynote.highlight is not None)
+    _default_metadata(keynote)
+    return keynote
+
+
+def _render_slides(keynote, nodes, cache=None, highlight=False,
+                   profiler=None, first=0):
+    """
+    Render the LaTeX code of slide nodes.
+
+    The type and LaTeX code of every node is yielded. If `highlight` is
+    True, the code of code slides is highlighted (see `keynotec.highlight`),
+    if 'Pygments' is installed, with the style on `keynote.highlight`,
+    which is chosen on the first code slide if the keynote has none. If a
+    `keynotec.profile.Profiler` is given, the rendering of each slide is
+    recorded, numbered from `first` + 1.
+    """
+    from keynotec import highlight as hl
+    from keynotec.render import render_slide
+    enabled = highlight and hl.available()
+    highlighter = None
+    for number, node in enumerate(nodes, first + 1):
+        with phase(profiler, 'render', number=number):
+            if enabled and node.type == 'code':
+                if highlighter is None:
+                    if keynote.highlight is None:
+                        theme = keynote.metadata.get('theme', '')
+                        keynote.highlight = hl.style_for(theme)
+                    highlighter = hl.Highlighter(cache, keynote.highlight)
+                slide = highlighter.slide(node)
+            else:
+                slide = (node.type, render_slide(node))
+        yield slide
+
+
+def _use_highlight(keynote, highlight=False):
+    """
+    Choose whether the code slides of a parsed keynote are highlighted.
+
+    If `highlight` is True, 'Pygments' is installed and the keynote has
+    code slides, the style they are highlighted with is set on
+    `keynote.highlight`, and the 'listings' environments, which are not
+    used by highlighted code, are removed from the keynote plugins.
+    """
+    from keynotec import highlight as hl
+    if not highlight or not hl.available():
+        return
+    if keynote.highlight is None:
+        if not any(node.type == 'code' for node in keynote.nodes):
+            return
+        keynote.highlight = hl.style_for(keynote.metadata.get('theme', ''))
+    keynote.plugins = {plugin for plugin in keynote.plugins
+                       if not plugin.startswith('listings/')}
+
+
+def _default_metadata(keynote):
+    """Fill in the keynote metadata that was not given."""
+    metadata = dict(metabase)
+    metadata.update(keynote.metadata)
+    keynote.metadata = metadata
+
+
+def _image_width(cache, image_width=None):
+    """Return the page width images are downscaled for (0 if they are not)."""
+    from keynotec import images
+    if cache is None or not images.available():
+        return 0
+    return images.DEFAULT_WIDTH if image_width is None else image_width
+
+
+def _stage_images(keynote, srcdir, cache, image_width):
+    """Return a directory with the downscaled images of a keynote, if any."""
+    import shutil
+    from keynotec import workspace
+    from keynotec.images import prepare_images
+    if not image_width:
+        return None
+    stagedir = workspace.create()
+    if not prepare_images(keynote, srcdir, stagedir, cache, image_width):
+        shutil.rmtree(stagedir, ignore_errors=True)
+        return None
+    return stagedir
+
 
-    filename = sys.argv[1]
+def _write_pdf(pdffile, data):
+    """Replace a PDF file atomically, so viewers never see partial files."""
+    _replace_file(pdffile, data)
+
+
+def _replace_file(filename, data):
+    """
+    Replace a file with some data atomically.
+
+    The data is written to a temporary file, created with the permissions
+    allowed by the umask, as any other output file, which is then moved
+    over the file.
+    """
+    import secrets
+    directory, name = os.path.split(os.path.abspath(filename))
+    tmpname = os.path.join(directory, '.{}.{}'.format(name,
+                                                      secrets.token_hex(8)))
+    fd = os.open(tmpname, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            output.write(data)
+        os.replace(tmpname, filename)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+def _move_pdf(source, pdffile):
+    """Move a PDF file into place, replacing the old one atomically."""
+    try:
+        os.replace(source, pdffile)
+    except OSError:
+        # not in the same file system.
+        with open(source, 'rb') as pdf:
+            _write_pdf(pdffile, pdf.read())
+        os.unlink(source)
+
+
+def build(filename, cache=None, max_passes=3, precompile=True, workdir=None,
+          split=1, profiler=None, timeout=None, fail_fast=False,
+          progress=xelatex.print_progress, image_width=None, highlight=False,
+          keep_artifacts=False, images=None):
+    """
+    Compile a keynote file into a PDF presentation.
+
+    Intermediate files are written to `workdir`, or, if none is given, to
+    a private workspace (see `keynotec.workspace`), which is removed after
+    the build, unless `keep_artifacts` is True, for debugging. The PDF is
+    written next to the keynote file, moved into place atomically. No
+    global state is used, so different keynotes can be built at the same
+    time from different threads.
+
+    If a `keynotec.cache.Cache` is given, PDF files from previous builds
+    are reused whenever their sources did not change. The auxiliary
+    files are kept on the cache between builds, and xelatex is run until
+    they do not change, at most `max_passes` times. Unless `precompile` is
+    False, the presentation style is precompiled into a cached format,
+    which is used by later builds with the same style.
+
+    With the cache, raster images larger than the space they are shown at
+    are downscaled for a page `image_width` pixels wide (1920, by default;
+    0 disables downscaling), if 'Pillow' is installed. Downscaled images
+    are cached by the contents of the original image.
+
+    If `highlight` is True, the code of code slides is highlighted with
+    'Pygments', if it is installed, instead of the 'listings' package.
+
+    If `split` is larger than 1, the slides are divided in that many
+    documents, compiled in parallel, and merged into the final PDF.
+
+    If a `keynotec.profile.Profiler` is given, the time and memory used by
+    each phase of the build are recorded.
+
+    Every xelatex pass is stopped if it takes longer than `timeout` seconds,
+    or, if `fail_fast` is True, on the first error. The `progress` function
+    is called with the number of each page typeset by xelatex.
+
+    If an `images` set is given, it is replaced by the images used by the
+    keynote once it is parsed, and kept as it is if it cannot be parsed.
+
+    Return the name of the PDF file, or None if it was not compiled without
+    errors.
+    """
+    import shutil
+    import tempfile
+    from keynotec import workspace
+    from keynotec.dedup import SlideWriter
+    if workdir is None:
+        workdir = workspace.create()
+        try:
+            return build(filename, cache=cache, max_passes=max_passes,
+                         precompile=precompile, workdir=workdir, split=split,
+                         profiler=profiler, timeout=timeout,
+                         fail_fast=fail_fast, progress=progress,
+                         image_width=image_width, highlight=highlight,
+                         keep_artifacts=keep_artifacts, images=images)
+        finally:
+            if keep_artifacts:
+                print("Intermediate files kept at {}".format(workdir))
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    srcdir = os.path.dirname(os.path.abspath(filename))
     name, _ = os.path.splitext(filename)
+    pdffile = '{}.pdf'.format(name)
+    name = os.path.join(workdir, os.path.basename(name))
     texfile = '{}.tex'.format(name)
-    metadata_file = 'resources/metadata.inc'
-    metafile = pkg_resources.resource_filename('keynotec', metadata_file)
 
     print("Processing {}".format(filename))
-    with open(filename, 'rt') as datafile:
-        keynote = parse_keynote((datafile.read(), 1))
-    if keynote is None:
-        raise Exception("Failed to load keynote data.")
+    # unless the keynote is compiled in parts, the slides are not kept in
+    # memory, but spooled to a file until the preamble can be written.
+    slides = tempfile.TemporaryFile('w+t') if split <= 1 else None
+    writer = SlideWriter(slides) if slides is not None else None
+    try:
+        with phase(profiler, 'parse'):
+            with open(filename, 'rt') as datafile:
+                keynote = _read_keynote(datafile, writer, cache, profiler,
+                                        highlight)
+        if images is not None:
+            images.clear()
+            images.update(keynote.images)
+        if writer is not None and writer.reused:
+            print(writer.report())
 
-    print("Preparing document.")
-    with open(texfile, 'wt') as output:
-        output.write("\\input{presentation}")
-        with open(metafile, 'rt') as meta:
-            metabase.update(keynote.metadata)
-            keynote.metadata = metabase
-            output.write(meta.read().format(**metabase))
-        for plugin in keynote.plugins:
-            output.write("\\input{{{plugin}}}".format(plugin=plugin))
-        _generate_pagenumber(keynote, output)
-        _generate_fullscreen(keynote, output)
-        # print slides
-        output.write('\\begin{document}')
-        for type, data in keynote.slides:
-            output.write(data)
-        output.write('\\end{document}')
+        fmt = None
+        if cache is not None and precompile:
+            with phase(profiler, 'format'):
+                fmt = _precompiled_format(cache, keynote)
+
+        print("Preparing document.")
+        with phase(profiler, 'generate'):
+            with open(texfile, 'wt') as output:
+                _generate_tex(keynote, output, fmt is None, slides=slides,
+                              cache=cache, profiler=profiler)
+    finally:
+        if slides is not None:
+            slides.close()
+
+    key = None
+    pdf = None
+    image_width = _image_width(cache, image_width)
+    if cache is not None:
+        key = _document_key(cache, keynote, texfile, srcdir, fmt,
+                            image_width)
+        pdf = cache.get(key)
+
+    error = False
+    if pdf is not None:
+        print("Reusing slides from a previous build.")
+        _write_pdf(pdffile, pdf)
+    else:
+        with phase(profiler, 'images'):
+            stagedir = _stage_images(keynote, srcdir, cache, image_width)
+        if cache is not None:
+            workspace.restore_state(cache, filename, workdir)
+        options = {
+            'timeout': timeout,
+            'fail_fast': fail_fast,
+            'progress': progress,
+            'images': stagedir,
+        }
+        try:
+            if split > 1:
+                from keynotec.split import build_parts
+                error = build_parts(keynote, name, split, max_passes, fmt,
+                                    srcdir, profiler, cache, **options)
+            else:
+                error = xelatex.run_passes(texfile, max_passes, fmt, srcdir,
+                                           profiler, **options)
+        finally:
+            if stagedir is not None:
+                shutil.rmtree(stagedir, ignore_errors=True)
+        output = '{}.pdf'.format(name)
+        if os.access(output, os.F_OK):
+            _move_pdf(output, pdffile)
+        if key is not None and not error and os.access(pdffile, os.F_OK):
+            with open(pdffile, 'rb') as output:
+                cache.put(key, output.read())
+            workspace.save_state(cache, filename, workdir)
+
+    if not keep_artifacts:
+        print("Cleaning up.")
+        with phase(profiler, 'cleanup'):
+            exts = ['log', 'vrb']
+            exts = exts + ["tex"] if not error else exts
+            for ext in exts:
+                fname = '{}.{}'.format(name, ext)
+                if os.access(fname, os.F_OK):
+                    os.unlink(fname)
 
-    print("Creating slides.")
-    error = _run_xelatex(texfile)
+    if os.access(pdffile, os.F_OK):
+        print(pdffile, "generated.")
+        if not error:
+            return pdffile
+    return None
 
-    print("Fixing references and effects.")
-    error |= _run_xelatex(texfile)
 
-    print("Cleaning up.")
-    exts = ['aux', 'log', 'nav', 'out', 'snm', 'toc', 'vrb']
-    exts = exts + ["tex"] if not error else exts
-    for ext in exts:
-        fname = '{}.{}'.format(name, ext)
-        if os.access(fname, os.F_OK):
-            os.unlink(fname)
+async def compile_async(source, **options):
+    """
+    Compile a keynote from asyncio code, returning its PDF.
 
-    if os.access('{}.pdf'.format(name), os.F_OK):
-        print('{}.pdf'.format(name), "generated.")
+    See `keynotec.aio.Compiler.compile` for the arguments.
+    """
+    from keynotec.aio import compile_async
+    return await compile_async(source, **options)
+
+
+def _argument_parser():
+    """Create the command line argument parser."""
+    from argparse import ArgumentParser, RawDescriptionHelpFormatter
+    themes = {
+        "apple_keynote_black": "Inspired by Apple Keynotes.",
+        "tchelinux": "A theme with Tux Gaudério.",
+        "chalkboard": "Reminder of your boring classes.",
+        "photographie": "A filmstrip background."
+    }
+    epilog = "Available Themes:\n" + "\n".join(
+        "\t{:>20}\t{}".format(k, v) for k, v in themes.items())
+    parser = ArgumentParser(prog="keynotec", epilog=epilog,
+                            usage="%(prog)s [build|watch] [options]"
+                                  " file...\n"
+                                  "       %(prog)s serve [options]",
+                            formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", metavar="file",
+                        help="keynote files, or directories with keynote"
+                             " files, to compile.")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of keynotes compiled in parallel"
+                             " (default: number of CPUs).")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to serve on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="port to serve on (default: 8000).")
+    parser.add_argument("--socket", default=None, metavar="PATH",
+                        help="serve on a Unix socket, instead of a port.")
+    parser.add_argument("--queue", type=int, default=16, metavar="N",
+                        help="number of requests waiting for a worker before"
+                             " new requests are rejected (default: 16).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not reuse results from previous builds.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory to store cached build results.")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="maximum size of the cache, in MB.")
+    parser.add_argument("--max-passes", type=int, default=3,
+                        help="maximum number of xelatex passes.")
+    parser.add_argument("--no-precompile", action="store_true",
+                        help="do not use a precompiled presentation style.")
+    parser.add_argument("--image-width", type=int, default=None,
+                        metavar="PIXELS",
+                        help="downscale images for pages PIXELS wide"
+                             " (default: 1920; 0 disables it; requires"
+                             " Pillow).")
+    parser.add_argument("--highlight", action="store_true",
+                        help="highlight code with Pygments, instead of"
+                             " the 'listings' package (requires"
+                             " Pygments).")
+    parser.add_argument("--split", type=int, default=1, metavar="N",
+                        help="compile the slides of each keynote as N"
+                             " documents in parallel, and merge them"
+                             " (requires pypdf).")
+    parser.add_argument("--timeout", type=float, default=None,
+                        metavar="SECONDS",
+                        help="stop xelatex passes taking longer than"
+                             " SECONDS.")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop xelatex on the first error.")
+    parser.add_argument("--keep-artifacts", action="store_true",
+                        help="keep the intermediate files of the build"
+                             " (LaTeX document, logs) for debugging.")
+    parser.add_argument("--profile", metavar="TRACE",
+                        help="report the time and memory used by each build"
+                             " phase, and save a Chrome trace to TRACE.")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--check", dest="mode", action="store_const",
+                       const="check",
+                       help="only parse the keynotes, reporting errors.")
+    modes.add_argument("--emit-tex", dest="mode", action="store_const",
+                       const="tex",
+                       help="write the LaTeX document of the keynotes,"
+                            " without compiling it.")
+    modes.add_argument("--emit-json", dest="mode", action="store_const",
+                       const="json",
+                       help="write the syntax tree of the keynotes as"
+                            " JSON.")
+    modes.add_argument("--emit-html", dest="mode", action="store_const",
+                       const="html",
+                       help="write an HTML preview of the keynotes (with"
+                            " watch, update it as the keynote changes).")
+    return parser
+
+
+def run():
+    """Run KeynoteC."""
+    parser = _argument_parser()
+    argv = sys.argv[1:]
+    command = "build"
+    if argv and argv[0] in ("build", "watch", "serve"):
+        command = argv.pop(0)
+    if not argv and command != "serve":
+        parser.print_help()
+        sys.exit(1)
+    args = parser.parse_args(argv)
+    if command == "serve" and args.files:
+        parser.error("serve does not take keynote files.")
+    if command != "serve" and not args.files:
+        parser.error("no keynote file was given.")
+    if command == "watch" and len(args.files) != 1:
+        parser.error("watch requires a single keynote file.")
+    single = len(args.files) == 1 and not os.path.isdir(args.files[0])
+    if args.profile and (command != "build" or not single):
+        parser.error("--profile requires building a single keynote file.")
+    if args.mode and command != "build" and \
+            (command, args.mode) != ("watch", "html"):
+        parser.error("--check and --emit-* only apply to build (and"
+                     " --emit-html to watch).")
+    if args.mode and args.profile:
+        parser.error("--profile cannot be used with --check and --emit-*.")
+    if args.keep_artifacts and (command == "serve" or args.mode):
+        parser.error("--keep-artifacts only applies to build and watch.")
+    if args.split > 1 and command != "serve" and not args.mode:
+        from keynotec.split import available
+        if not available():
+            parser.error("--split requires 'pypdf'.")
+    if args.highlight:
+        from keynotec.highlight import available
+        if not available():
+            parser.error("--highlight requires 'Pygments'.")
+
+    cache = None
+    if not args.no_cache:
+        from keynotec.cache import Cache
+        cache = Cache(args.cache_dir, args.cache_size * 1024 * 1024)
+    options = {
+        'cache': cache,
+        'max_passes': args.max_passes,
+        'precompile': not args.no_precompile,
+        'timeout': args.timeout,
+        'fail_fast': args.fail_fast,
+        'image_width': args.image_width,
+        'highlight': args.highlight,
+    }
+    if args.mode and command == "build":
+        from keynotec.emit import emit_all
+        if emit_all(args.files, args.mode, cache, args.highlight):
+            sys.exit(1)
+        return
+    if command == "serve":
+        from keynotec.serve import serve
+        serve(args.host, args.port, args.socket, args.jobs, args.queue,
+              **options)
+        return
+    options['split'] = args.split
+    options['keep_artifacts'] = args.keep_artifacts
+    if command == "watch":
+        from keynotec.watch import watch
+        watch(args.files[0], html=args.mode == "html", **options)
+    elif single:
+        profiler = None
+        if args.profile:
+            from keynotec.profile import Profiler
+            profiler = Profiler()
+        build(args.files[0], profiler=profiler, **options)
+        if profiler is not None:
+            print(profiler.report())
+            profiler.save(args.profile)
+    else:
+        from keynotec.batch import build_all
+        if build_all(args.files, args.jobs, **options):
+            sys.exit(1)
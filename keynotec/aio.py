@@ -0,0 +1,257 @@
+"""Compile keynotes from asyncio code."""
+
+import asyncio
+import os
+import shutil
+import weakref
+
+import keynotec
+from keynotec import workspace, xelatex
+
+
+class CompileError(Exception):
+    """
+    A keynote could not be compiled.
+
+    `errors` is the list of error messages, either from loading the keynote
+    or reported by xelatex.
+    """
+
+    def __init__(self, message, errors=None):
+        """Initialize the error with a message and the errors found."""
+        super().__init__(message)
+        self.errors = [message] if errors is None else list(errors)
+
+
+def _read_source(source, basedir=None):
+    """
+    Return the keynote text, and the directory to look for images on.
+
+    `source` may be a path (a path-like object, or a string naming an
+    existing file without line breaks), or the text of a keynote.
+    """
+    if isinstance(source, os.PathLike) or \
+            ('\n' not in source and os.path.isfile(source)):
+        with open(source, 'rt') as datafile:
+            text = datafile.read()
+        if basedir is None:
+            basedir = os.path.dirname(os.path.abspath(source))
+        return text, basedir
+    return source, os.path.abspath(os.getcwd() if basedir is None
+                                   else basedir)
+
+
+def _write_tex(keynote, texfile, preamble, cache=None):
+    """Write the LaTeX document of a keynote to `texfile`."""
+    with open(texfile, 'wt') as output:
+        keynotec._generate_tex(keynote, output, preamble, cache=cache)
+
+
+async def _run(texfile, fmt=None, cwd=None, timeout=None, fail_fast=False,
+               progress=None, images=None):
+    """
+    Run xelatex once as a subprocess, returning the errors it reported.
+
+    The process is killed if it takes longer than `timeout` seconds (a
+    CompileError is raised), or if the calling task is cancelled.
+    """
+    from subprocess import PIPE, STDOUT
+    cmd, cwd = xelatex.command(texfile, fmt, cwd, fail_fast)
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=PIPE, stderr=STDOUT, cwd=cwd,
+        env=xelatex.environment(fmt, images))
+    errors = []
+    finished = False
+
+    async def read_output():
+        nonlocal finished
+        async for line in proc.stdout:
+            line = line.decode('utf-8', 'replace').rstrip('\n')
+            if line and line[0] == '!':
+                errors.append(line)
+                if fail_fast:
+                    return
+            for page in xelatex.page_marker.findall(line):
+                if progress is not None:
+                    progress(int(page))
+        # xelatex may still be writing the PDF after closing its output.
+        await proc.wait()
+        finished = True
+
+    try:
+        await asyncio.wait_for(read_output(), timeout)
+    except asyncio.TimeoutError:
+        message = "xelatex did not finish in {} seconds.".format(timeout)
+        raise CompileError(message, errors + [message])
+    finally:
+        if not finished:
+            proc.kill()
+        await proc.wait()
+    return errors
+
+
+async def _run_passes(texfile, max_passes=3, fmt=None, cwd=None, **options):
+    """Run xelatex until the auxiliary files converge, returning errors."""
+    name, _ = os.path.splitext(texfile)
+    state = xelatex.auxiliary_state(name)
+    errors = []
+    for count in range(max_passes):
+        errors = await _run(texfile, fmt, cwd, **options)
+        previous, state = state, xelatex.auxiliary_state(name)
+        if errors or state == previous:
+            break
+    return errors
+
+
+class Compiler:
+    """
+    Compile keynotes concurrently from an event loop.
+
+    At most `jobs` keynotes (by default, the number of CPUs) are typeset at
+    the same time, further requests wait for their turn, so that many
+    concurrent requests do not overload the machine.
+
+    If `persistent` is True, working directories are kept between builds,
+    so that auxiliary files are reused, until the compiler is closed.
+    """
+
+    def __init__(self, jobs=None, persistent=False):
+        """Initialize the compiler, limiting concurrent builds to `jobs`."""
+        self.limiter = asyncio.Semaphore(jobs or os.cpu_count() or 1)
+        self.persistent = persistent
+        self.workdirs = []
+
+    def close(self):
+        """Remove the working directories kept by the compiler."""
+        while self.workdirs:
+            shutil.rmtree(self.workdirs.pop(), ignore_errors=True)
+
+    async def compile(self, source, output=None, basedir=None, **options):
+        """
+        Compile a keynote, given its text or the path to its file.
+
+        Images are searched on `basedir`, which defaults to the directory of
+        the keynote file, or the current directory for keynote texts. The
+        other arguments are used as in `compile_text`.
+        """
+        loop = asyncio.get_running_loop()
+        text, basedir = await loop.run_in_executor(None, _read_source,
+                                                   source, basedir)
+        return await self.compile_text(text, output, basedir, **options)
+
+    async def compile_text(self, text, output=None, basedir=None,
+                           cache=None, max_passes=3, precompile=True,
+                           timeout=None, fail_fast=False, progress=None,
+                           image_width=None, highlight=False):
+        """
+        Compile the text of a keynote.
+
+        The `text` is always compiled as the keynote source, even if it
+        names a file. Images are searched on `basedir`, which defaults to
+        the current directory. If `output` is given, the PDF is written
+        (atomically) to it, and its path is returned, otherwise the PDF
+        contents are returned. The other arguments are used as in
+        `keynotec.build`.
+
+        Raise CompileError if the keynote cannot be loaded or if xelatex
+        reports errors.
+        """
+        loop = asyncio.get_running_loop()
+        basedir = os.path.abspath(os.getcwd() if basedir is None
+                                  else basedir)
+        try:
+            keynote = await loop.run_in_executor(None, keynotec._load_keynote,
+                                                 text, None, highlight)
+        except Exception as e:
+            raise CompileError(str(e)) from e
+
+        async with self.limiter:
+            if self.workdirs:
+                workdir = self.workdirs.pop()
+            else:
+                workdir = workspace.create()
+            try:
+                pdf = await self._typeset(keynote, workdir, basedir, cache,
+                                          max_passes, precompile, timeout,
+                                          fail_fast, progress, image_width)
+            finally:
+                if self.persistent:
+                    self.workdirs.append(workdir)
+                else:
+                    shutil.rmtree(workdir, ignore_errors=True)
+
+        if output is None:
+            return pdf
+        await loop.run_in_executor(None, keynotec._write_pdf, output, pdf)
+        return output
+
+    async def _typeset(self, keynote, workdir, basedir, cache, max_passes,
+                       precompile, timeout, fail_fast, progress,
+                       image_width):
+        """Typeset a keynote on `workdir`, returning the PDF contents."""
+        loop = asyncio.get_running_loop()
+        fmt = None
+        if cache is not None and precompile:
+            fmt = await loop.run_in_executor(
+                None, keynotec._precompiled_format, cache, keynote)
+        texfile = os.path.join(workdir, 'keynote.tex')
+        # rendering (and highlighting) a large keynote, or reading the
+        # cache, must not stall the other requests of the loop.
+        await loop.run_in_executor(None, _write_tex, keynote, texfile,
+                                   fmt is None, cache)
+
+        key = None
+        image_width = keynotec._image_width(cache, image_width)
+        if cache is not None:
+            key = await loop.run_in_executor(
+                None, keynotec._document_key, cache, keynote, texfile,
+                basedir, fmt, image_width)
+            pdf = await loop.run_in_executor(None, cache.get, key)
+            if pdf is not None:
+                return pdf
+
+        images = None
+        if image_width:
+            from keynotec.images import prepare_images
+            images = os.path.join(workdir, 'images')
+            shutil.rmtree(images, ignore_errors=True)
+            os.mkdir(images)
+            staged = await loop.run_in_executor(None, prepare_images, keynote,
+                                                basedir, images, cache,
+                                                image_width)
+            if not staged:
+                images = None
+
+        pdffile = os.path.join(workdir, 'keynote.pdf')
+        if os.access(pdffile, os.F_OK):
+            os.unlink(pdffile)
+        errors = await _run_passes(texfile, max_passes, fmt, basedir,
+                                   timeout=timeout, fail_fast=fail_fast,
+                                   progress=progress, images=images)
+        if errors:
+            raise CompileError("xelatex reported errors.", errors)
+        try:
+            with open(pdffile, 'rb') as output:
+                pdf = output.read()
+        except OSError:
+            raise CompileError("xelatex did not generate a PDF.")
+        if key is not None:
+            await loop.run_in_executor(None, cache.put, key, pdf)
+        return pdf
+
+
+# a compiler for each event loop, as a limiter belongs to a single loop.
+_compilers = weakref.WeakKeyDictionary()
+
+
+async def compile_async(source, **options):
+    """
+    Compile a keynote with the default compiler of the running loop.
+
+    The `options` are passed to `Compiler.compile`.
+    """
+    loop = asyncio.get_running_loop()
+    compiler = _compilers.get(loop)
+    if compiler is None:
+        compiler = _compilers[loop] = Compiler()
+    return await compiler.compile(source, **options)
@@ -0,0 +1,99 @@
+"""Compile many keynotes in parallel."""
+
+import contextlib
+import io
+import os
+import shutil
+import time
+
+import keynotec
+from keynotec import workspace
+
+
+def collect_keynotes(paths):
+    """List keynote files from files and directories (searched for *.key)."""
+    keynotes = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                keynotes.extend(os.path.join(root, name)
+                                for name in sorted(files)
+                                if name.endswith('.key'))
+        else:
+            keynotes.append(path)
+    # a keynote must be built only once, or jobs would overwrite its PDF.
+    unique = {}
+    for filename in keynotes:
+        unique.setdefault(os.path.abspath(filename), filename)
+    return list(unique.values())
+
+
+def _build_job(filename, options):
+    """
+    Build a single keynote in its own working directory.
+
+    Return a tuple (filename, pdffile, elapsed, errors, workdir), where
+    `pdffile` is None if the build failed, `errors` are the error messages
+    of the build, and `workdir` is the directory with the intermediate files
+    of the build, if the 'keep_artifacts' option is set (otherwise, it is
+    removed, and `workdir` is None).
+    """
+    workdir = workspace.create()
+    output = io.StringIO()
+    start = time.perf_counter()
+    pdffile = None
+    errors = []
+    with contextlib.redirect_stdout(output):
+        try:
+            pdffile = keynotec.build(filename, workdir=workdir, **options)
+        except Exception as e:
+            errors.append(str(e))
+    elapsed = time.perf_counter() - start
+    errors = [line for line in output.getvalue().splitlines()
+              if line.startswith('!')] + errors
+    if not options.get('keep_artifacts'):
+        shutil.rmtree(workdir, ignore_errors=True)
+        workdir = None
+    return (filename, pdffile, elapsed, errors, workdir)
+
+
+def build_all(paths, jobs=None, **options):
+    """
+    Build keynotes from files and directories using a pool of processes.
+
+    Every keynote is built on a private working directory, so that builds
+    running at the same time do not share intermediate files. The `options`
+    are passed to `keynotec.build`. A line is printed for every keynote as
+    its build finishes, followed by a summary. Return the number of failed
+    builds.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    keynotes = collect_keynotes(paths)
+    if not keynotes:
+        raise Exception("No keynote file was found.")
+    start = time.perf_counter()
+    failed = []
+    total = 0.0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_build_job, filename, options)
+                   for filename in keynotes]
+        for future in as_completed(futures):
+            filename, pdffile, elapsed, errors, workdir = future.result()
+            total += elapsed
+            if pdffile is not None:
+                print("[ OK ] {} ({:.2f}s)".format(filename, elapsed))
+                if workdir is not None:
+                    print("       Intermediate files at {}".format(workdir))
+            else:
+                failed.append(filename)
+                print("[FAIL] {} ({:.2f}s)".format(filename, elapsed))
+                for line in errors:
+                    print("       {}".format(line))
+                if workdir is not None:
+                    print("       Intermediate files at {}".format(workdir))
+    elapsed = time.perf_counter() - start
+    summary = "{} succeeded, {} failed, in {:.2f}s ({:.2f}s of build time)."
+    print(summary.format(len(keynotes) - len(failed), len(failed),
+                         elapsed, total))
+    return len(failed)
@@ -0,0 +1,145 @@
+"""An on-disk, content addressed cache for keynote builds."""
+
+import hashlib
+import os
+import tempfile
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def default_directory():
+    """Return the default cache directory for KeynoteC."""
+    directory = os.environ.get('KEYNOTEC_CACHE_DIR')
+    if directory:
+        return directory
+    base = os.environ.get('XDG_CACHE_HOME', '')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'keynotec')
+
+
+def file_signature(filename):
+    """Return a string that changes whenever the given file changes."""
+    try:
+        info = os.stat(filename)
+    except OSError:
+        return "{}:missing".format(filename)
+    return "{}:{}:{}".format(filename, info.st_size, info.st_mtime_ns)
+
+
+def file_digest(filename):
+    """Return the SHA-256 digest of the contents of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as data:
+        for chunk in iter(lambda: data.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_signature(directory):
+    """Return a string that changes whenever a file in a directory changes."""
+    signatures = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            signatures.append(file_signature(os.path.join(root, name)))
+    return "\n".join(signatures)
+
+
+class Cache:
+    """
+    Store build artifacts in a directory, indexed by a content hash.
+
+    Whenever the total size of the stored entries is larger than `max_size`
+    bytes, the least recently used entries are removed.
+    """
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        """Initialize a cache on the given directory."""
+        self.directory = directory or default_directory()
+        self.max_size = max_size
+        self._size = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """Compute the cache key for a sequence of strings or bytes."""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode('utf-8')
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    def path(self, key):
+        """Return the path of the file that stores the given key."""
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Return the data stored for a key, or None if it is not cached."""
+        filename = self.path(key)
+        try:
+            with open(filename, 'rb') as entry:
+                data = entry.read()
+        except OSError:
+            return None
+        self.touch(key)
+        return data
+
+    def touch(self, key):
+        """Mark an entry as recently used, returning if it is cached."""
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            return False
+        return True
+
+    def put(self, key, data):
+        """Store data for a key, evicting old entries if needed."""
+        filename = self.path(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # write to a temporary file so readers never see partial entries.
+        fd, tmpname = tempfile.mkstemp(prefix='.',
+                                       dir=os.path.dirname(filename))
+        try:
+            with os.fdopen(fd, 'wb') as entry:
+                entry.write(data)
+            os.replace(tmpname, filename)
+        except BaseException:
+            os.unlink(tmpname)
+            raise
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data)
+        if self._size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        """List (mtime, size, filename) for every entry in the cache."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                filename = os.path.join(root, name)
+                try:
+                    info = os.stat(filename)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, filename))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(filename)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
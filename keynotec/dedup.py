@@ -0,0 +1,71 @@
+"""Write the LaTeX code of long repeated slides only once."""
+
+import hashlib
+
+# slides with verbatim code (fragile frames) cannot be saved in macros.
+FRAGILE = {'code'}
+# slides shorter than this (in characters), such as a section divider or a
+# logo slide, which are a single command, are not made much shorter by a
+# macro, and are always written out.
+MIN_SIZE = 128
+
+
+class SlideWriter:
+    """
+    Write the LaTeX code of slides, reusing the code of repeated slides.
+
+    The first time the code of a slide is repeated, it is saved in a macro
+    (see `\\saveslide` on presentation.tex), and later repetitions only use
+    the macro. Slides that are not repeated, and short slides, are written
+    as they are. Only a digest of every slide is kept, not its code.
+    `saved_bytes` is the size of the code not written, less the code of
+    the macros.
+
+    Macros only make the LaTeX document shorter: xelatex still expands
+    and typesets every repetition of a slide, as any other slide.
+    """
+
+    def __init__(self, output):
+        """Initialize a writer to a LaTeX document."""
+        self.output = output
+        self.macros = {}
+        self.saved_slides = 0
+        self.slides = 0
+        self.reused = 0
+        self.saved_bytes = 0
+
+    def write(self, slide):
+        """Write the LaTeX code of a (type, code) slide."""
+        type, code = slide
+        self.slides += 1
+        if type in FRAGILE or len(code) < MIN_SIZE:
+            self.output.write(code)
+            return
+        digest = hashlib.sha256(code.encode('utf-8')).digest()
+        macro = self.macros.get(digest)
+        if macro is None:
+            # only saved when repeated, as most slides are not.
+            self.macros[digest] = 0
+            self.output.write(code)
+        elif macro == 0:
+            self.saved_slides += 1
+            macro = self.macros[digest] = self.saved_slides
+            saved = "\\saveslide{{{}}}{{{}}}".format(macro, code)
+            self.output.write(saved)
+            self.reused += 1
+            self.saved_bytes -= len(saved) - len(code)
+        else:
+            usage = "\\useslide{{{}}}".format(macro)
+            self.output.write(usage)
+            self.reused += 1
+            self.saved_bytes += len(code) - len(usage)
+
+    def report(self):
+        """Describe how many slides were written from macros."""
+        report = "{} of {} slides written from {} macros, making the LaTeX" \
+                 " document {} bytes {}."
+        # slides repeated only once make the document longer, by the code
+        # that saves them.
+        change = "shorter" if self.saved_bytes >= 0 else "longer"
+        return report.format(self.reused, self.slides, self.saved_slides,
+                             abs(self.saved_bytes), change)
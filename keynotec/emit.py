@@ -0,0 +1,90 @@
+"""Check keynotes, or write their LaTeX, HTML or syntax tree, offline."""
+
+import io
+import json
+import os
+import time
+
+import keynotec
+from keynotec.batch import collect_keynotes
+
+MODES = ('check', 'tex', 'json', 'html')
+
+
+def keynote_tree(keynote):
+    """
+    Return the syntax tree of a keynote, as data serializable to JSON.
+
+    The tree has the keynote `metadata`, and its `slides`, the nodes created
+    by the parser (see `keynotec.nodes`).
+    """
+    return {'metadata': keynote.metadata,
+            'slides': [node.to_dict() for node in keynote.nodes]}
+
+
+def emit(filename, mode='check', cache=None, highlight=False):
+    """
+    Parse a keynote and generate its LaTeX document, without compiling it.
+
+    With mode 'tex' the document is written to a '.tex' file, with mode
+    'json' the syntax tree of the keynote is written to a '.json' file, and
+    with mode 'html' a preview (see `keynotec.preview`) is written to a
+    '.html' file, beside the keynote. Code is highlighted on the LaTeX
+    document as on `keynotec.build`. Return the keynote and the written
+    file (None for mode 'check').
+    """
+    if mode not in MODES:
+        raise Exception("Invalid mode: {}".format(mode))
+    with open(filename, 'rt') as datafile:
+        keynote = keynotec._read_keynote(datafile, cache=cache,
+                                         highlight=highlight and mode == 'tex')
+    name, _ = os.path.splitext(filename)
+    outfile = None
+    if mode == 'json':
+        outfile = name + '.json'
+        with open(outfile, 'wt') as output:
+            json.dump(keynote_tree(keynote), output, indent=2)
+            output.write('\n')
+    elif mode == 'html':
+        from keynotec.preview import Preview
+        outfile = name + '.html'
+        srcdir = os.path.dirname(os.path.abspath(filename))
+        Preview(srcdir).write(keynote, outfile)
+    elif mode == 'tex':
+        outfile = name + '.tex'
+        with open(outfile, 'wt') as output:
+            keynotec._generate_tex(keynote, output, cache=cache)
+    else:
+        # generating the document also validates the metadata.
+        keynotec._generate_tex(keynote, io.StringIO())
+    return keynote, outfile
+
+
+def emit_all(paths, mode='check', cache=None, highlight=False):
+    """
+    Check keynotes from files and directories, or write their output.
+
+    A line is printed for every keynote, followed by a summary. Return the
+    number of keynotes which failed to parse.
+    """
+    keynotes = collect_keynotes(paths)
+    if not keynotes:
+        raise Exception("No keynote file was found.")
+    start = time.perf_counter()
+    failed = 0
+    for filename in keynotes:
+        try:
+            keynote, outfile = emit(filename, mode, cache, highlight)
+        except Exception as e:
+            failed += 1
+            print("[FAIL] {}".format(filename))
+            print("       {}".format(e))
+            continue
+        result = "{} slides".format(len(keynote.nodes))
+        if outfile is not None:
+            result += ", {}".format(outfile)
+        print("[ OK ] {} ({})".format(filename, result))
+    elapsed = time.perf_counter() - start
+    summary = "{} succeeded, {} failed, in {:.2f}s."
+    print(summary.format(len(keynotes) - failed, failed, elapsed))
+    return failed
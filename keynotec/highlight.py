@@ -0,0 +1,76 @@
+"""Highlight the code of code slides with Pygments, caching the result."""
+
+from functools import lru_cache
+
+# themes with dark backgrounds, which need a style with light colors.
+DARK_THEMES = {'apple_keynote_black', 'chalkboard', 'invaders'}
+
+
+def available():
+    """Return True if code can be highlighted ('Pygments' is installed)."""
+    from importlib.util import find_spec
+    return find_spec('pygments') is not None
+
+
+def style_for(theme):
+    """Return the Pygments style used for code slides on a theme."""
+    return 'monokai' if theme in DARK_THEMES else 'default'
+
+
+@lru_cache(maxsize=None)
+def style_defs(style):
+    """Return the LaTeX definitions of the commands used by a style."""
+    from pygments.formatters.latex import LatexFormatter
+    return LatexFormatter(style=style).get_style_defs()
+
+
+class Highlighter:
+    """
+    Highlight code into LaTeX, colored as a Pygments `style`.
+
+    Code is highlighted into a 'Verbatim' environment (from 'fancyvrb'),
+    which xelatex copies as it is, instead of tokenizing it on every pass
+    as 'listings' does. If a `keynotec.cache.Cache` is given, highlighted
+    code is cached by language, code and style. Languages unknown to
+    Pygments are written as plain text.
+    """
+
+    def __init__(self, cache=None, style='default'):
+        """Initialize the highlighter."""
+        self.cache = cache
+        self.style = style
+
+    def highlight(self, language, code):
+        """Return the highlighted LaTeX code for some source code."""
+        import pygments
+        key = None
+        if self.cache is not None:
+            key = self.cache.key('highlight', language, code, self.style,
+                                 pygments.__version__)
+            listing = self.cache.get(key)
+            if listing is not None:
+                return listing.decode('utf-8')
+        # the formatters and lexers packages load their classes on the
+        # first attribute lookup, which is not safe with many threads, so
+        # the modules that define them are imported instead.
+        from pygments.formatters.latex import LatexFormatter
+        from pygments.lexers import get_lexer_by_name
+        from pygments.lexers.special import TextLexer
+        from pygments.util import ClassNotFound
+        try:
+            lexer = get_lexer_by_name(language)
+        except ClassNotFound:
+            lexer = TextLexer()
+        formatter = LatexFormatter(style=self.style,
+                                   verboptions='fontsize=\\footnotesize')
+        listing = pygments.highlight(code, lexer, formatter)
+        if key is not None:
+            self.cache.put(key, listing.encode('utf-8'))
+        return listing
+
+    def slide(self, node):
+        """Render a code slide, with highlighted code."""
+        from keynotec.render import render_code, wrap_transition
+        listing = self.highlight(node.language, node.code)
+        slide = render_code(node, listing.rstrip('\n'))
+        return (node.type, wrap_transition(node, slide))
@@ -0,0 +1,110 @@
+"""Downscale the images of a keynote to the size they are shown at."""
+
+import os
+import shutil
+
+# Width, in pixels, of the page images are downscaled for (pages are 16:9).
+DEFAULT_WIDTH = 1920
+
+RASTER_EXTENSIONS = ['.png', '.jpg', '.jpeg']
+
+
+def available():
+    """Return True if images can be resized ('Pillow' is installed)."""
+    from importlib.util import find_spec
+    return find_spec('PIL') is not None
+
+
+def find_image(image, srcdir):
+    """Return the file used for an image, as graphicx would find it."""
+    # graphicx allows the file extension to be omitted.
+    exts = [''] if os.path.splitext(image)[1] else \
+        ['.pdf', '.png', '.jpg', '.jpeg']
+    for ext in exts:
+        path = os.path.join(srcdir, image + ext)
+        if os.path.isfile(path):
+            return image + ext, path
+    return None, None
+
+
+def _content_digest(cache, path):
+    """Return the digest of the contents of a file, cached by signature."""
+    from keynotec.cache import file_signature
+    key = cache.key('image-digest', file_signature(path))
+    digest = cache.get(key)
+    if digest is None:
+        with open(path, 'rb') as image:
+            digest = cache.key(image.read()).encode('ascii')
+        cache.put(key, digest)
+    return digest.decode('ascii')
+
+
+def downscale(path, width, height):
+    """
+    Return the contents of an image resized to fit width x height pixels.
+
+    Return None if the image is already small enough, or if it cannot be
+    resized. Requires 'Pillow'.
+    """
+    import io
+    from PIL import Image
+    try:
+        with Image.open(path) as image:
+            if image.width <= width and image.height <= height:
+                return None
+            fmt = image.format
+            image.thumbnail((width, height), Image.LANCZOS)
+            output = io.BytesIO()
+            if fmt == 'JPEG':
+                image.save(output, fmt, quality=90, optimize=True)
+            else:
+                image.save(output, fmt, optimize=True)
+    except Exception:
+        return None
+    return output.getvalue()
+
+
+def prepare_images(keynote, srcdir, stagedir, cache, width=DEFAULT_WIDTH):
+    """
+    Downscale the images of a keynote, storing them on `stagedir`.
+
+    Every raster image larger than the largest space it is shown at, on a
+    page `width` pixels wide, is resized, and saved on `stagedir` with the
+    same name it has relative to `srcdir`, so that it is found before the
+    original when `stagedir` is searched first. An image is resized once,
+    even if it is shown on many slides, and the results are cached by the
+    contents of the original image. Return the number of images staged.
+
+    Images are not resized if 'Pillow' is not installed.
+    """
+    if not available():
+        return 0
+    staged = 0
+    for image in sorted(keynote.images):
+        name, path = find_image(image, srcdir)
+        if path is None or os.path.isabs(name) or \
+                '..' in name.replace('\\', '/').split('/') or \
+                os.path.splitext(name)[1].lower() not in RASTER_EXTENSIONS:
+            continue
+        slot = keynote.image_slots.get(image, (1.0, 1.0))
+        size = (int(width * slot[0]), int(width * 9 / 16 * slot[1]))
+        key = cache.key('image', _content_digest(cache, path),
+                        '{}x{}'.format(*size))
+        if not cache.touch(key):
+            # an empty entry records that the original image is used.
+            cache.put(key, downscale(path, *size) or b'')
+        data = cache.path(key)
+        target = os.path.join(stagedir, name)
+        try:
+            if os.path.getsize(data) == 0:
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(data, target)
+            except OSError:
+                shutil.copyfile(data, target)
+        except OSError:
+            # the entry was evicted: the original image is used.
+            continue
+        staged += 1
+    return staged
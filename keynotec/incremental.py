@@ -0,0 +1,240 @@
+"""
+Parse keynotes incrementally, for editors and watch mode.
+
+A Document keeps an index of where each part of a keynote source (its
+metadata, and every slide) starts, with the result of parsing each part.
+When the source is edited, only the slides touched by the edit are parsed
+again, and the changes to the slides are returned.
+"""
+
+import json
+from bisect import bisect_left, bisect_right
+from copy import copy
+
+from keynotec.parser import Keynote, check_end, find_slide_end, \
+    parse_metadata, parse_slide, slide_boundary
+
+
+class Document:
+    """
+    A keynote source, parsed incrementally.
+
+    The source is split in parts, as `keynotec.parser.split_slides` does:
+    part 0 is the metadata, and part N is slide N. Every part is parsed on
+    its own, starting at its line on the source, so errors are reported
+    with the lines of the whole source.
+    """
+
+    def __init__(self, source):
+        """Parse a keynote source."""
+        self.source = ""
+        self.parts = []
+        self.offsets = []
+        self.edit(0, 0, source)
+
+    @property
+    def metadata(self):
+        """Return the metadata of the keynote."""
+        return self.parts[0]['metadata']
+
+    @property
+    def errors(self):
+        """Return the messages of the errors found, in source order."""
+        errors = [str(part['error']) for part in self.parts if part['error']]
+        if len(self.parts) < 2:
+            errors.append("No slide was defined.")
+        return errors
+
+    def boundaries(self):
+        """Return the offset and line of the start of every slide."""
+        return [(part['offset'], part['line']) for part in self.parts[1:]]
+
+    def slide_at(self, offset):
+        """Return the number of the slide at an offset (0 for metadata)."""
+        return max(0, bisect_right(self.offsets, offset) - 1)
+
+    def keynote(self):
+        """
+        Return the parsed keynote.
+
+        Raise the first error found on the source, as
+        `keynotec.parser.parse_keynote` would.
+        """
+        for part in self.parts:
+            if part['error'] is not None:
+                raise part['error']
+        if len(self.parts) < 2:
+            raise Exception("No slide was defined.")
+        keynote = Keynote()
+        keynote.metadata = dict(self.metadata)
+        for part in self.parts[1:]:
+            keynote.nodes.append(part['node'])
+            keynote.plugins.update(part['plugins'])
+            for image, (width, height) in part['image_slots'].items():
+                keynote.add_image(image, width, height)
+        return keynote
+
+    def update(self, source):
+        """
+        Replace the source, parsing again only the slides that changed.
+
+        The edit is found from the text the sources start and end with.
+        Return the changes to the slides, as `edit` does.
+        """
+        length = min(len(self.source), len(source))
+        start = _common_length(self.source, source, length, False)
+        end = _common_length(self.source, source, length - start, True)
+        return self.edit(start, len(self.source) - end,
+                         source[start:len(source) - end])
+
+    def edit(self, start, end, text):
+        """
+        Replace the source from offset `start` up to `end` with `text`.
+
+        Only the slides touched by the edit are parsed again. Return the
+        changes to the slides, a list of (change, number, line) where
+        `change` is 'added', 'removed' or 'changed', and `number` and `line`
+        are the slide number and line (on the source before the edit, for
+        removed slides). Slide number 0 is the metadata.
+        """
+        delta = len(text) - (end - start)
+        lines = text.count('\n') - self.source.count('\n', start, end)
+        old_source = self.source
+        self.source = source = old_source[:start] + text + old_source[end:]
+        # start at the part before the edit, as the edit may change where
+        # the edited part starts.
+        first = max(0, bisect_right(self.offsets, start) - 2)
+        if self.parts:
+            offset, line = self.offsets[first], self.parts[first]['line']
+        else:
+            offset, line = 0, 1
+        # split the source again, until a part ends where an old part,
+        # after the edit, starts.
+        spans = []
+        last = len(self.parts)
+        while True:
+            if not spans and first == 0:
+                match = slide_boundary.search(source)
+                stop = len(source) if match is None else match.start()
+            else:
+                stop = find_slide_end(source, offset)
+            spans.append((offset, stop, line))
+            if stop >= len(source):
+                break
+            if stop >= start + len(text):
+                last = bisect_left(self.offsets, stop - delta)
+                if first < last < len(self.offsets) and \
+                        self.offsets[last] == stop - delta:
+                    break
+                last = len(self.parts)
+            line += source.count('\n', offset, stop)
+            offset = stop
+
+        old = self.parts[first:last]
+        # slides which source did not change are moved, not parsed again.
+        reused = {}
+        for number, part in enumerate(old, first):
+            if number > 0 and part['error'] is None:
+                reused[old_source[part['offset']:part['end']]] = part
+        metadata = self.parts[0]['metadata'] if first > 0 else None
+        new = []
+        for offset, stop, line in spans:
+            part = reused.get(source[offset:stop])
+            if part is not None and (first > 0 or new):
+                part = _moved(part, offset, stop, line)
+            else:
+                part = self._parse(offset, stop, line, metadata)
+            if metadata is None:
+                metadata = part['metadata']
+            new.append(part)
+        following = []
+        for part in self.parts[last:]:
+            part = _moved(part, part['offset'] + delta, part['end'] + delta,
+                          part['line'] + lines)
+            if part['error'] is not None and lines:
+                # report errors with the new lines.
+                part = self._parse(part['offset'], part['end'], part['line'],
+                                   metadata)
+            following.append(part)
+        self.parts[first:] = new + following
+        self.offsets = [part['offset'] for part in self.parts]
+        return _changes(old, new, first)
+
+    def _parse(self, offset, end, line, metadata=None):
+        """Parse a slide, or the metadata if no `metadata` is given."""
+        part = {
+            'offset': offset,
+            'end': end,
+            'line': line,
+            'metadata': {},
+            'node': None,
+            'plugins': [],
+            'image_slots': {},
+            'error': None,
+        }
+        data = (self.source[offset:end], 0, line)
+        try:
+            if metadata is None:
+                part['metadata'], data = parse_metadata(data)
+            else:
+                context = Keynote()
+                context.metadata = metadata
+                part['node'], data = parse_slide(context, data)
+                part['plugins'] = sorted(context.plugins)
+                part['image_slots'] = context.image_slots
+            check_end(data)
+        except Exception as e:
+            part['error'] = e
+        return part
+
+
+def _moved(part, offset, end, line):
+    """Return a part moved to another position on the source."""
+    part = dict(part, offset=offset, end=end, line=line)
+    if part['node'] is not None:
+        part['node'] = copy(part['node'])
+        part['node'].line = line
+    return part
+
+
+def _key(part):
+    """Return what is compared to find if a part changed."""
+    if part['error'] is not None:
+        return str(part['error'])
+    node = part['node'] and dict(part['node'].to_dict(), line=None)
+    return json.dumps([part['metadata'], node], sort_keys=True)
+
+
+def _changes(old, new, first):
+    """List the changes from the `old` to the `new` parts."""
+    from difflib import SequenceMatcher
+    matcher = SequenceMatcher(None, [_key(part) for part in old],
+                              [_key(part) for part in new], autojunk=False)
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        common = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+        for j in range(j1, j1 + common):
+            changes.append(('changed', first + j, new[j]['line']))
+        for i in range(i1 + common, i2):
+            changes.append(('removed', first + i, old[i]['line']))
+        for j in range(j1 + common, j2):
+            changes.append(('added', first + j, new[j]['line']))
+    return changes
+
+
+def _common_length(a, b, length, suffix):
+    """Return the length of the prefix (or suffix) two strings share."""
+    low, high = 0, length
+    while low < high:
+        size = (low + high + 1) // 2
+        if suffix:
+            same = a[len(a) - size:] == b[len(b) - size:]
+        else:
+            same = a[:size] == b[:size]
+        if same:
+            low = size
+        else:
+            high = size - 1
+    return low
@@ -0,0 +1,212 @@
+"""
+The nodes of parsed slides.
+
+Every slide type has a node class, with slots for the contents of its
+slides, with text as written in the keynote, so that the nodes of large
+keynotes take little memory. Nodes are rendered into LaTeX by
+`keynotec.render`, and into HTML by `keynotec.preview`, and are converted
+to dictionaries (e.g. to be cached, or written as JSON) with `to_dict`,
+and back with `from_dict`.
+"""
+
+
+class Transition:
+    """The transition played when a slide is shown."""
+
+    __slots__ = ('name', 'duration')
+
+    def __init__(self, name, duration):
+        """Initialize a transition."""
+        self.name = name
+        self.duration = duration
+
+    def to_dict(self):
+        """Return the transition as a dictionary."""
+        return {'name': self.name, 'duration': self.duration}
+
+
+class Item:
+    """An item of a list, nested `level` levels deep."""
+
+    __slots__ = ('level', 'text')
+
+    def __init__(self, level, text):
+        """Initialize an item."""
+        self.level = level
+        self.text = text
+
+    def to_dict(self):
+        """Return the item as a dictionary."""
+        return {'level': self.level, 'text': self.text}
+
+
+class Slide:
+    """
+    A parsed slide.
+
+    Every slide has its `type`, the `line` it starts at, and its
+    `transition` (or None). Subclasses add a slot for each of the `fields`
+    with the contents of their slides.
+    """
+
+    __slots__ = ('line', 'transition')
+    type = None
+    fields = ()
+
+    def __init__(self, line=None, transition=None, **contents):
+        """Initialize a slide with its contents."""
+        self.line = line
+        self.transition = transition
+        for field in self.fields:
+            setattr(self, field, contents.pop(field))
+        if contents:
+            error = "Invalid fields for {} slide: {}"
+            raise Exception(error.format(self.type, ", ".join(contents)))
+
+    def __eq__(self, other):
+        """Return True if both slides have the same contents and position."""
+        return type(self) is type(other) and \
+            self.to_dict() == other.to_dict()
+
+    def to_dict(self):
+        """Return the slide as a dictionary, serializable to JSON."""
+        node = {
+            'type': self.type,
+            'line': self.line,
+            'transition': self.transition and self.transition.to_dict(),
+        }
+        for field in self.fields:
+            value = getattr(self, field)
+            if isinstance(value, tuple):
+                value = [getattr(item, 'to_dict', lambda: item)()
+                         for item in value]
+            node[field] = value
+        return node
+
+
+class CoverPage(Slide):
+    """The cover, created from the keynote metadata."""
+
+    __slots__ = ()
+    type = 'coverpage'
+
+
+class BigTitle(Slide):
+    """A slide with a big title."""
+
+    __slots__ = ('title',)
+    type = 'bigtitle'
+    fields = __slots__
+
+
+class Citation(Slide):
+    """A quote, and its author."""
+
+    __slots__ = ('quote', 'author')
+    type = 'citation'
+    fields = __slots__
+
+
+class Images(Slide):
+    """A slide with images, which slide types show one, two or four."""
+
+    __slots__ = ('images',)
+    fields = __slots__
+
+
+class BigImage(Images):
+    """A slide with a single image."""
+
+    __slots__ = ()
+    type = 'bigimage'
+
+
+class TwoImages(Images):
+    """A slide with two images, side by side."""
+
+    __slots__ = ()
+    type = 'twoimages'
+
+
+class FourImages(Images):
+    """A slide with four images."""
+
+    __slots__ = ()
+    type = 'fourimages'
+
+
+class Code(Slide):
+    """A slide with a code listing, in a `language`."""
+
+    __slots__ = ('title', 'language', 'code')
+    type = 'code'
+    fields = __slots__
+
+
+class ItemList(Slide):
+    """
+    A slide with a list of `items`.
+
+    The items are packed in a single string, with a "level text" line for
+    every item, which takes much less memory than an Item and a string for
+    each one, and are unpacked into Items when they are read. Items with
+    line breaks, which the parser never creates, are kept as they are.
+    """
+
+    __slots__ = ('_items',)
+
+    @property
+    def items(self):
+        """Return the items of the slide."""
+        if not isinstance(self._items, str):
+            return self._items
+        if not self._items:
+            return ()
+        return tuple(Item(int(level), text) for level, text in
+                     (line.split(' ', 1)
+                      for line in self._items.split('\n')))
+
+    @items.setter
+    def items(self, items):
+        """Set the items of the slide, packing them if possible."""
+        if any('\n' in item.text for item in items):
+            self._items = tuple(items)
+        else:
+            self._items = '\n'.join('{} {}'.format(item.level, item.text)
+                                     for item in items)
+
+
+class Items(ItemList):
+    """A slide with a list of items."""
+
+    __slots__ = ('title',)
+    type = 'items'
+    fields = ('title', 'items')
+
+
+class ItemsImage(ItemList):
+    """A slide with a list of items, and an image on its `image_side`."""
+
+    __slots__ = ('title', 'images', 'image_side')
+    type = 'items+image'
+    fields = ('title', 'items', 'images', 'image_side')
+
+
+def from_dict(node):
+    """Create a slide from its dictionary (see `Slide.to_dict`)."""
+    contents = dict(node)
+    cls = node_types[contents.pop('type')]
+    if contents['transition'] is not None:
+        contents['transition'] = Transition(**contents['transition'])
+    if 'items' in contents:
+        contents['items'] = tuple(Item(**item) for item in contents['items'])
+    if 'images' in contents:
+        contents['images'] = tuple(contents['images'])
+    return cls(**contents)
+
+
+node_types = {
+    cls.type: cls
+    for cls in (CoverPage, BigTitle, Citation, BigImage, TwoImages,
+                FourImages, Code, Items, ItemsImage)
+}
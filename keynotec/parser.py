@@ -1,47 +1,166 @@
 #!/usr/bin/env python3
 
-"""A recursive descendent parser for a keynote DSL."""
-
-from string import ascii_letters, digits, whitespace
+"""
+A recursive descendent parser for a keynote DSL.
+
+The parser state is a cursor tuple `(content, position, line)`, where
+`content` is the whole source, `position` is the offset of the next
+character to be read and `line` is the line number at that offset. Parsing
+functions return `[value, cursor]`, and never copy the remaining input, so
+parsing time is linear on the size of the source.
+"""
+
+from string import whitespace
+import re
+import sys
 import keynotec
-
-letters = {c for c in ascii_letters}
-numbers = {d for d in digits}
+from keynotec.nodes import Item, Transition, node_types
+from keynotec.profile import phase
+from keynotec.render import listings_languages, transitions
+
+# Lexer tables, matched at a position of the source with a single call.
+spaces = re.compile('[{}]*'.format(re.escape(whitespace)))
+indentation = re.compile(' *')
+token_chars = re.compile('[A-Za-z0-9]*')
+transition_name = re.compile('[^{},)]*'.format(re.escape(whitespace)))
+transition_length = re.compile('[0-9][0-9.]*')
+# a line starting a slide (':') or a code block ('```').
+slide_boundary = re.compile(r'^[ \t]*(```|:)', re.MULTILINE)
+# a transition on its own line, before the slide type.
+transition_line = re.compile(r'[ \t]*:[ \t]*\([^)\n]*\)[ \t]*\n')
 
 
 class Keynote:
-    """Hold keynote data."""
+    """
+    Hold keynote data.
+
+    A Keynote is also the parsing context: it is passed through the slide
+    parsers, which record on it everything the document needs, and no
+    parsing state is shared between keynotes.
+
+    `nodes` holds the parsed slides (see `keynotec.nodes`). Their LaTeX
+    code is not kept, but rendered when the document is generated.
+    """
 
     def __init__(self):
         """Initialize an empty keynote."""
         self.metadata = {}
-        self.slides = []
+        self.nodes = []
+        # the Pygments style of highlighted code (see keynotec.highlight).
+        self.highlight = None
         self.plugins = set([])
+        self.images = set([])
+        self.image_slots = {}
 
+    def add_image(self, image, width, height):
+        """
+        Record an image used by a slide.
 
-keynote = Keynote()
+        The width and height of the space where the image is shown, as a
+        fraction of the page size, are recorded, keeping the largest space
+        the image is shown at.
+        """
+        self.images.add(image)
+        slot = self.image_slots.get(image, (0, 0))
+        self.image_slots[image] = (max(slot[0], width), max(slot[1], height))
 
 
-def parse_keynote(data):
-    """keynote: metadata slide+."""
-    metadata, data = parse_metadata(data)
-    keynote.metadata = metadata
-    while True:
-        slide, data = parse_slide(data)
-        if not slide:
-            break
-        keynote.slides.append(slide)
-        data = skip_space(data)
-    if not keynote.slides:
-        raise Exception("No slide was defined.")
+def parse_keynote(data, profiler=None):
+    """
+    keynote: metadata slide+.
 
+    Every call returns a new Keynote, so it is safe to parse different
+    keynotes concurrently. If a `keynotec.profile.Profiler` is given, the
+    parsing of each slide is recorded.
+    """
+    keynote = Keynote()
     content, line = data
-    if content:
-        error = "There should be no input left at line {}"
-        raise Exception(error.format(line))
+    sources = split_slides(content, line)
+    keynote.nodes.extend(parse_slides(keynote, sources, profiler))
     return keynote
 
 
+def parse_slides(keynote, sources, profiler=None):
+    """
+    Parse a keynote from the sources of its metadata and of its slides.
+
+    `sources` yields the source of each part of the keynote, and the line
+    it starts at, as `split_slides` and `read_slides` do. The metadata is
+    parsed into `keynote`, and the node of every slide is yielded as soon
+    as the slide is parsed, so that a single slide is kept in memory at a
+    time.
+    """
+    sources = iter(sources)
+    source, line = next(sources)
+    keynote.metadata, data = parse_metadata((source, 0, line))
+    number = 0
+    for source, line in sources:
+        check_end(data)
+        number += 1
+        with phase(profiler, 'slide', number=number):
+            node, data = parse_slide(keynote, (source, 0, line))
+        yield node
+    check_end(data)
+    if number == 0:
+        raise Exception("No slide was defined.")
+
+
+def check_end(data):
+    """Check that nothing is left to parse, but white space."""
+    content, i, line = skip_space(data)
+    if i < len(content):
+        raise Exception("Expected ':' at line {}".format(line))
+
+
+def split_slides(content, line=1):
+    """
+    Split a keynote source into the sources of its metadata and slides.
+
+    Yield the source of each part, and the line it starts at.
+    """
+    match = slide_boundary.search(content)
+    start, end = 0, len(content) if match is None else match.start()
+    while True:
+        yield content[start:end], line
+        if end >= len(content):
+            break
+        line += content.count('\n', start, end)
+        start, end = end, find_slide_end(content, end)
+
+
+def read_slides(datafile, line=1, size=1 << 16):
+    """
+    Read a keynote source from a file, splitting it as `split_slides` does.
+
+    The file is read in chunks of (at least) `size` characters, and only
+    the source that was not yielded yet is kept in memory.
+    """
+    buffer = ""
+    start = 0
+    eof = False
+    metadata = True
+    while True:
+        if metadata:
+            match = slide_boundary.search(buffer)
+            end = len(buffer) if match is None else match.start()
+        else:
+            end = find_slide_end(buffer, start)
+        if end >= len(buffer) and not eof:
+            # read at least as much as is pending, so that large slides
+            # are not scanned again for every chunk.
+            chunk = datafile.read(max(size, len(buffer) - start))
+            buffer = buffer[start:] + chunk
+            start = 0
+            eof = not chunk
+            continue
+        yield buffer[start:end], line
+        if end >= len(buffer):
+            break
+        line += buffer.count('\n', start, end)
+        start = end
+        metadata = False
+
+
 def parse_metadata(data):
     """metadata: metadata_key value."""
     data = skip_space(data)
@@ -60,425 +179,348 @@ def parse_metadata_key(data):
     A metadata key can be one of 'theme', 'author', 'institute',
     'date', 'title', 'subtitle', 'language'.
     """
-    content, line = data
     valid_keys = keynotec.metabase.keys()
-    token, data = next_token(data)
+    token, cursor = next_token(data)
     if token in valid_keys:
-        return [token, data]
+        return [token, cursor]
     else:
-        return [None, (content, line)]
+        return [None, data]
 
 
 def parse_metadata_value(data):
     """Parse a metadata value: ':' STRING."""
-    content, line = skip_space(data)
-    if content[0] != ":":
+    content, i, line = skip_space(data)
+    if content[i:i+1] != ":":
         raise Exception("Expected ':' at line", line)
-    content, line = skip_space((content[1:], line))
-    return parse_STRING((content, line))
+    return parse_STRING(skip_space((content, i + 1, line)))
 
 
-def parse_slide(data):
+def parse_slide(keynote, data):
     """slide: transition? ":" slide_type (slide_content)?."""
-    data = skip_space(data)
+    content, i, start = data = skip_space(data)
     transition, data = parse_transition(data)
     type, data = parse_slide_type(data)
     if type is None:
-        return [None, data]
-    # TYPES: parse proprer slide type.
-    slide_parser = {
-        'coverpage': parse_slide_coverpage,
-        'bigtitle': parse_slide_bigtitle,
-        'citation': parse_slide_citation,
-        'bigimage': parse_slide_bigimage,
-        'twoimages': parse_slide_twoimages,
-        'fourimages': parse_slide_fourimages,
-        'code': parse_slide_code,
-        'items': parse_slide_items,
-        'items+image': parse_slide_itemimage,
-    }
-    if type not in slide_parser:
+        raise Exception("Expected slide type at line {}".format(data[2]))
+    if type not in slide_parsers:
         error = "Invalid slide type '{}' at line {}"
-        raise Exception(error.format(type, data[1]))
-    slide, data = slide_parser[type](data)
-    _, line = data
+        raise Exception(error.format(type, data[2]))
+    node, data = slide_parsers[type](keynote, data)
+    _, _, line = data
     if transition is not None:
-        transition_text = "{{{transition}[direction={direction}]}}"
-        template = "\\addtobeamertemplate{background canvas}"
-        slide_text = "{{{template}{transition}{{}}{slide}}}"
-        t, duration = transition
-        valid_transitions = {
-            "dissolve": ("\\transdissolve", 0),
-            "pushright": ("\\transcover", 0),
-            "pushleft": ("\\transcover", 180),
-            "covertop": ("\\transcover", 90),
-            "coverbottom": ("\\transcover", 270),
-        }
-        if t not in valid_transitions:
+        name, duration = transition
+        if name not in transitions:
             error = "Invalid transition {} near line {}."
-            raise Exception(error.format(t, line))
-        transition, direction = valid_transitions[t]
-        transition_text = transition_text.format(transition=transition,
-                                                 direction=direction,
-                                                 duration=duration)
-        slide = slide_text.format(template=template,
-                                  transition=transition_text,
-                                  slide=slide)
-    return [(type, slide), data]
+            raise Exception(error.format(name, line))
+        transition = Transition(name, duration)
+    node = node_types[type](start, transition, **node)
+    return [node, data]
+
+
+def find_slide_end(content, start):
+    """Find where the slide starting at the given offset ends."""
+    match = transition_line.match(content, start)
+    if match is not None:
+        # the slide type is on the line after the transition.
+        start = spaces.match(content, match.end()).end()
+    i = content.find('\n', start)
+    while i >= 0:
+        match = slide_boundary.search(content, i + 1)
+        if match is None:
+            break
+        if match.group(1) == ':':
+            return match.start()
+        # skip the code block, up to the line with the closing '```'.
+        i = content.find('\n', match.end())
+        if i >= 0:
+            i = content.find('```', i + 1)
+        if i >= 0:
+            i = content.find('\n', i)
+    return len(content)
 
 
 def parse_transition(data):
     """transition: ':' '(" transition_type (',' NUMBER)? ')'."""
-    content, line = data
-    if not content:
-        return [None, (None, line)]
-    if content[0] != ":":
+    content, i, line = data
+    if i >= len(content):
+        return [None, data]
+    if content[i] != ":":
         raise Exception("Expected ':' at line {}".format(line))
-    content, line = skip_space((content[1:], line))
-    if content[0] != "(":
+    content, i, line = skip_space((content, i + 1, line))
+    if content[i:i+1] != "(":
         return [None, data]
-    i = 1
-    while content[i] not in whitespace and content[i] not in ",)":
-        i += 1
-    transition = content[1:i]
-    content, line = skip_space((content[i:], line))
-    if content[0] == ',':
-        content, line = skip_space((content[1:], line))
+    start = i + 1
+    i = transition_name.match(content, start).end()
+    # names used on many slides are interned, so they are kept only once.
+    transition = sys.intern(content[start:i])
+    content, i, line = skip_space((content, i, line))
+    if content[i:i+1] == ',':
+        content, i, line = skip_space((content, i + 1, line))
     length = 0.5
-    if content[0] in digits:
-        i = 1
-        while content[i] in digits or content[i] == '.':
-            i += 1
-        length = float(content[0:i])
-        content, line = skip_space((content[i:], line))
-    if content[0] != ')':
+    match = transition_length.match(content, i)
+    if match is not None:
+        i = match.end()
+        length = float(match.group())
+        content, i, line = skip_space((content, i, line))
+    if content[i:i+1] != ')':
         raise Exception("Expected ')' at line {}.".format(line))
-    return [(transition, length), (content[1:], line)]
+    return [(transition, length), (content, i + 1, line)]
 
 
 def parse_slide_type(data):
     """slide_type: ":" STRING."""
-    content, line = skip_space(data)
-    if not content:
-        return [None, (None, line)]
-    if content[0] != ":":
+    content, i, line = data = skip_space(data)
+    if i >= len(content):
+        return [None, data]
+    if content[i] != ":":
         raise Exception("Expected ':' at line {}".format(line))
-    type, data = parse_STRING((content[1:], line))
+    type, data = parse_STRING((content, i + 1, line))
     return [type, data]
 
 
-def parse_slide_coverpage(data):
+def parse_slide_coverpage(keynote, data):
     """There's no data for coverpage."""
     # Nothing to do in coverpage.
-    return ['\\coverframe', data]
+    return [{}, data]
 
 
-def parse_slide_bigtitle(data):
+def parse_slide_bigtitle(keynote, data):
     """Bigtitle only has a title."""
-    title, (content, line) = parse_title(data)
+    title, data = parse_title(data)
     if title is None:
-        raise Exception("Expected '#' at line", line)
-    fmt = '\\bigtitle{{{}}}'
-    return [fmt.format(title), (content, line)]
+        raise Exception("Expected '#' at line", data[2])
+    return [{'title': title}, data]
 
 
-def parse_slide_citation(data):
-    """Bigtitle only has a title."""
+def parse_slide_citation(keynote, data):
+    """citation: title cite."""
     citation, data = parse_title(data)
     author, data = parse_cite(data)
-    fmt = '\\citation{{{}}}{{{}}}'
-    return [fmt.format(citation, author), data]
+    return [{'quote': citation, 'author': author}, data]
 
 
-def parse_slide_bigimage(data):
+def parse_slide_bigimage(keynote, data):
     """Bigtitle only has a title."""
     image, data = parse_image(data)
     if image is None:
-        _, line = data
+        _, _, line = data
         raise Exception("Expecting '[' to parse image at line {}".format(line))
-    fmt = '\\bigimage{{{}}}'
-    return [fmt.format(image), data]
+    keynote.add_image(image, 1.0, 1.0)
+    return [{'images': (image,)}, data]
 
 
-def parse_slide_twoimages(data):
+def parse_slide_twoimages(keynote, data):
     """Bigtitle only has a title."""
     imageleft, data = parse_image(data)
     if imageleft is None:
-        _, line = data
+        _, _, line = data
         raise Exception("Expecting '[' to parse image at line {}".format(line))
     data = skip_space(data)
     imageright, data = parse_image(data)
     if imageright is None:
-        _, line = data
+        _, _, line = data
         raise Exception("Expecting '[' to parse image at line {}".format(line))
-    fmt = '\\twoimages{{{}}}{{{}}}'
-    return [fmt.format(imageleft, imageright), data]
+    keynote.add_image(imageleft, 0.45, 0.99)
+    keynote.add_image(imageright, 0.45, 0.99)
+    return [{'images': (imageleft, imageright)}, data]
 
 
-def parse_slide_fourimages(data):
+def parse_slide_fourimages(keynote, data):
     """Bigtitle only has a title."""
     images = [''] * 4
     for i in range(4):
         images[i], data = parse_image(data)
         if images[i] is None:
-            _, line = data
+            _, _, line = data
             error = "Expecting '[' to parse image at line {}"
             raise Exception(error.format(line))
         data = skip_space(data)
-    fmt = '\\fourimages{{{}}}{{{}}}{{{}}}{{{}}}'
-    return [fmt.format(*images), data]
+    for image in images:
+        keynote.add_image(image, 0.45, 0.45)
+    return [{'images': tuple(images)}, data]
 
 
-def parse_slide_code(data):
+def parse_slide_code(keynote, data):
     """code: (title)? '```' code_block '```'."""
-    title, data = optional_title(data)
+    title, data = parse_title(data)
     data = skip_space(data)
     (language, code), data = parse_code_block(data)
-    keynote.plugins.add('listings/{}'.format(language))
-    frame = """\\begin{{frame}}[fragile]
-        \\frametitle{{{title}}}\n{content}\n\\end{{frame}}
-    """
-    template = """\\begin{{{language}}}\n{code}\n\\end{{{language}}}"""
-    content = template.format(language=language, code=code)
-    return [frame.format(title=title if title is not None else "",
-                         content=content), data]
+    if language in listings_languages():
+        keynote.plugins.add('listings/{}'.format(language))
+    return [{'title': title, 'language': language, 'code': code}, data]
 
 
 def parse_code_block(data):
     """code_block: "```" STRING /.*?(?=```)/ "```"."""
-    content, line = data
-    if content[0:3] != "```":
+    content, i, line = data
+    if not content.startswith("```", i):
         raise Exception("Expected '```' at line {}.".format(line))
-    lang, (content, line) = parse_STRING((content[3:], line))
-    line += 1
-    i = 0
-    while i < len(content)-3 and content[i:i+3] != '```':
-        if content[i] == '\n':
-            line += 1
-        i += 1
-    value = content[:i]
+    lang, (content, start, line) = parse_STRING((content, i + 3, line))
+    end = content.find('```', start)
+    if end < 0:
+        end = max(start, len(content) - 3)
+    line += content.count('\n', start, end)
+    value = content[start:end]
     # skip closing '```'.
-    return [(lang, value), (content[i+3:], line)]
+    return [(sys.intern(lang), value), (content, end + 3, line)]
 
 
-def parse_slide_items(data):
+def parse_slide_items(keynote, data):
     """items: "items" title? itemlist."""
-    title, data = optional_title(data)
+    title, data = parse_title(data)
     items, data = parse_itemlist(data)
-    # TODO: process items.
-    itemtext = process_items(items)
     data = skip_space(data)
-    frame = """\\begin{{frame}}\n\\frametitle{{{title}}}
-               {items}\n\\end{{frame}}\n"""
-    frame = frame.format(title=title, items=itemtext)
-    return [frame, data]
+    return [{'title': title, 'items': items}, data]
 
 
-def parse_slide_itemimage(data):
+def parse_slide_itemimage(keynote, data):
     """itemimage: "items+image" title? (image itemlist | itemlist image)."""
-    title, data = optional_title(data)
-    image, (content, line) = parse_image(data)
+    title, data = parse_title(data)
+    image, (content, i, line) = parse_image(data)
     left = image is not None
     if left:
-        i = 0
-        while content[i] != '\n':
-            i += 1
-        data = (content[i + 1:], line + 1)
+        i = content.index('\n', i)
+        data = (content, i + 1, line + 1)
     else:
-        data = (content, line)
+        data = (content, i, line)
     items, data = parse_itemlist(data)
     if not left:
         data = skip_space(data)
         image, data = parse_image(data)
     if image is None:
-        _, line = data
+        _, _, line = data
         error = "Expected image for items+image slide at line {}"
         raise Exception(error.format(line))
-    frame = """\\begin{{frame}}[t]
-               \\frametitle{{{title}}}{c}\n\\end{{frame}}\n"""
-    columns = """\\begin{{columns}}{cols}\\end{{columns}}"""
-    column = """
-        \\begin{{column}}{{{size}\\textwidth}}{content}\\end{{column}}
-    """
-    img = """
-        \\begin{{center}}
-        {{\\includegraphics[width=\\textwidth, height=.5\\paperheight,
-        keepaspectratio]{{{i}}}}}
-        \\end{{center}}
-    """
-    cimg = column.format(size=0.45, content=img.format(i=image))
-    citems = column.format(size=0.55, content=process_items(items))
-    coltext = cimg + citems if left else citems + cimg
-    result = frame.format(title=title, c=columns.format(cols=coltext))
-    return [result, data]
+    # the image column is 0.45 of the text width, at most half page high.
+    keynote.add_image(image, 0.45, 0.5)
+    node = {
+        'title': title,
+        'items': items,
+        'images': (image,),
+        'image_side': 'left' if left else 'right',
+    }
+    return [node, data]
 
 
 # -- general item parsig functions --
 
-def optional_title(data):
-    """Parse an optional title."""
-    title, data = parse_title(data)
-    return ["" if title is None else title, data]
-
-
-def process_items(items):
-    """Create a multi-level itemize list."""
-    last, items = items
-    start, end = "\\begin{itemize}", "\\end{itemize}"
-    result = start
-    stack = [end]
-    for ident, item in items:
-        if ident < last:
-            result += stack.pop()
-            last = ident
-        elif ident > last:
-            stack.append(end)
-            result += start
-            last = ident
-        result += "\\item {}".format(item)
-    while stack:
-        result += stack.pop()
-    return result
-
-
 def parse_itemlist(data):
-    """itemlist: singleitem (singleitem)+."""
-    content, line = data
+    """
+    itemlist: singleitem (singleitem)+.
+
+    Every item is nested one level deeper than the previous item if it is
+    more indented, or one level up if it is less indented.
+    """
     items = []
-    min = 0
+    min = last = level = 0
     while True:
-        item, (content, line) = parse_singleitem((content, line))
+        item, data = parse_singleitem(data)
         if item is None:
             break
+        indent, text = item
         if not items:
-            min = item[0]
-        else:
-            if item[0] < min:
-                e = "Items cannot have less identation than first item"
-                raise Exception((e + " at line {}").format(line))
-        items.append(item)
-    return [(min, items), (content, line)]
+            min = last = indent
+        elif indent < min:
+            e = "Items cannot have less identation than first item"
+            raise Exception((e + " at line {}").format(data[2]))
+        if indent < last:
+            level -= 1
+        elif indent > last:
+            level += 1
+        last = indent
+        items.append(Item(level, text))
+    return [tuple(items), data]
 
 
 def parse_singleitem(data):
     """singleitem: level "*|-" STRING."""
-    content, line = data
-    level = 0
-    while level < len(content) and content[level] == " ":
-        level += 1
-    if level == len(content):
-        return [None, (None, line)]
-    if content[level] == '\n':
-        return [None, (content[level+1:], line+1)]
-    if content[level] not in ('*', '-'):
+    content, i, line = data
+    end = indentation.match(content, i).end()
+    level = end - i
+    i = end
+    if i == len(content):
+        return [None, (content, i, line)]
+    if content[i] == '\n':
+        return [None, (content, i + 1, line + 1)]
+    if content[i] not in ('*', '-'):
         return [None, data]
-    data = skip_space((content[level+1:], line))
-    item, (content, line) = parse_FORMATTED_STRING(data)
-    return [(level, item), (content, line)]
+    item, data = parse_STRING(skip_space((content, i + 1, line)))
+    return [(level, item), data]
 
 
 def parse_STRING(data):
     r"""STRING: ([^\\n]*)\\n."""
-    content, line = data
-    i = 0
-    while i < len(content) and content[i] != '\n':
-        i += 1
-    value = content[:i].strip()
-    return [value, (content[i + 1:], line + 1)]
-
-
-def parse_FORMATTED_STRING(data):
-    r"""FORMATTED_STRING: ([^\\n]|\*[^*]\*|/[^/]/)*\\n."""
-    formatters = {
-        '*': ("\\textbf{", False),
-        '/': ('\\textit{', False),
-        '_': ('\\underline{', False),
-        '|': ('\\texttt{', False),
-    }
-    value, data = parse_STRING(data)
-    i = 0
-    while i < len(value):
-        if value[i] == "\\":
-            if value[i+1] in list(formatters.keys()) + ['\\']:
-                if value[i+1] == "_":
-                    i += 1
-                else:
-                    value = value[:i] + value[i+1:]
-            else:
-                i += 1
-
-        else:
-            if value[i] in formatters:
-                key = value[i]
-                text, status = formatters[key]
-                if status:
-                    value = value[:i] + "}" + value[i+1:]
-                else:
-                    value = value[:i] + text + value[i+1:]
-                    i += len(text)
-                formatters[key] = (text, not status)
-        i += 1
-    return [value, data]
+    content, i, line = data
+    end = content.find('\n', i)
+    if end < 0:
+        end = len(content)
+    value = content[i:end].strip()
+    return [value, (content, min(end + 1, len(content)), line + 1)]
 
 
 def parse_image(data):
     r"""image: \[([^]+)\]."""
-    content, line = data
-    if content[0] != '[':
+    content, i, line = data
+    if content[i:i+1] != '[':
         return [None, data]
-    i = 0
-    while i < len(content) and content[i] != ']':
-        i += 1
-    if not i < len(content):
+    end = content.find(']', i)
+    if end < 0:
         error = "Image open at end of file (from line {})"
         raise Exception(error.format(line))
-    value = content[1:i]
+    value = sys.intern(content[i + 1:end])
     # skip closing ']' by starting at next character.
-    return [value, (content[i + 1:], line)]
+    return [value, (content, end + 1, line)]
 
 
 def parse_title(data):
     """title: # STRING."""
-    content, line = skip_space(data)
-    if content[0] != "#":
+    content, i, line = skip_space(data)
+    if content[i:i+1] != "#":
         return [None, data]
-    if len(content) > 1 and content[1] not in {' ', '\t'}:
+    if i + 1 < len(content) and content[i + 1] not in {' ', '\t'}:
         error = "Expected a whitespace after '#' at line {}"
         raise Exception(error.format(line))
-    return parse_FORMATTED_STRING((content[2:], line))
+    return parse_STRING((content, i + 2, line))
 
 
 def parse_cite(data):
     """title: # STRING."""
-    content, line = skip_space(data)
-    if len(content) < 2:
+    content, i, line = skip_space(data)
+    if len(content) - i < 2:
         raise Exception("Expected citation author at line {}.", line)
-    if content[0] != "-" and content[1] != '-':
+    if content[i] != "-" and content[i + 1] != '-':
         raise Exception("Expected '--' at line", line)
-    return parse_FORMATTED_STRING((content[2:], line))
+    return parse_STRING((content, i + 2, line))
 
 
 # -- general parsing functions --
 
 def skip_space(data):
     """Skip white space in input."""
-    content, line = data
-    if not content:
-        return None, (None, line)
-    i = 0
-    while i < len(content) and content[i] in whitespace:
-        if content[i] == '\n':
-            line += 1
-        i += 1
-    return [content[i:], line]
+    content, i, line = data
+    end = spaces.match(content, i).end()
+    if end > i:
+        line += content.count('\n', i, end)
+    return (content, end, line)
 
 
 def next_token(data):
     """Extract next token from input."""
-    content, line = skip_space(data)
-    if not content:
-        return None, [None, line]
-    i = 0
-    while i < len(content) and content[i] in (letters | numbers):
-        i += 1
-    return content[:i].strip(), [content[i:], line]
+    content, start, line = skip_space(data)
+    if start >= len(content):
+        return None, (content, start, line)
+    i = token_chars.match(content, start).end()
+    return content[start:i], (content, i, line)
+
+
+slide_parsers = {
+    'coverpage': parse_slide_coverpage,
+    'bigtitle': parse_slide_bigtitle,
+    'citation': parse_slide_citation,
+    'bigimage': parse_slide_bigimage,
+    'twoimages': parse_slide_twoimages,
+    'fourimages': parse_slide_fourimages,
+    'code': parse_slide_code,
+    'items': parse_slide_items,
+    'items+image': parse_slide_itemimage,
+}
@@ -0,0 +1,206 @@
+"""
+Render keynotes into HTML, for a preview that does not need xelatex.
+
+The HTML document has every slide of the keynote, rendered from the nodes
+created by the parser, with the same layouts of the LaTeX slides, and
+transitions played as CSS animations.
+"""
+
+import html
+import json
+import os
+
+import keynotec
+from keynotec.render import format_text
+
+formatters = {
+    '*': ('<b>', '</b>'),
+    '/': ('<i>', '</i>'),
+    '_': ('<u>', '</u>'),
+    '|': ('<code>', '</code>'),
+}
+
+DOCUMENT = """<!DOCTYPE html>
+<html lang="{language}">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+{style}</style>
+</head>
+<body class="theme-{theme}">
+{slides}</body>
+</html>
+"""
+
+SLIDE = '<section id="{number}" class="slide {type}{transition}"{style}>' \
+    '{content}{pagenumber}</section>\n'
+
+
+def format_html(value):
+    """Convert formatted text into HTML."""
+    return format_text(value or "", formatters, {}, html.escape)
+
+
+def render_itemlist(items):
+    """Create a multi-level list."""
+    result = ["<ul>"]
+    stack = ["</ul>"]
+    last = 0
+    for item in items:
+        level = item.level
+        if level < last:
+            result.append(stack.pop())
+        elif level > last:
+            stack.append("</ul>")
+            result.append("<ul>")
+        last = level
+        result.append("<li>")
+        result.append(format_html(item.text))
+    while stack:
+        result.append(stack.pop())
+    return "".join(result)
+
+
+def render_title(node):
+    """Render the title of a slide, if it has one."""
+    if not node.title:
+        return ""
+    return "<h2>{}</h2>".format(format_html(node.title))
+
+
+class Preview:
+    """
+    Render keynotes into a single HTML document.
+
+    Images are referred relative to `outdir`, the directory the document
+    is written to, and searched on `srcdir` and on the resources bundled
+    with KeynoteC, as xelatex would. The HTML code of every slide is kept,
+    so that a keynote that is rendered again (e.g. after it is edited) only
+    has the slides that changed rendered again.
+    """
+
+    def __init__(self, srcdir=".", outdir=None):
+        """Initialize a preview for keynotes on `srcdir`."""
+        self.srcdir = srcdir
+        self.outdir = srcdir if outdir is None else outdir
+        self.slides = {}
+        self.rendered = 0
+
+    def render(self, keynote):
+        """Return the HTML document of a parsed keynote."""
+        metadata = keynote.metadata
+        slides = {}
+        result = []
+        self.rendered = 0
+        for number, node in enumerate(keynote.nodes, 1):
+            key = json.dumps(dict(node.to_dict(), line=None),
+                             sort_keys=True)
+            if node.type == 'coverpage':
+                key += json.dumps(metadata, sort_keys=True)
+            content = self.slides.get(key)
+            if content is None:
+                content = slide_renderers[node.type](self, node, metadata)
+                self.rendered += 1
+            slides[key] = content
+            result.append(self.render_slide(node, number, content, metadata))
+        # slides that were removed are not kept.
+        self.slides = slides
+        with open(os.path.join(keynotec.resources_dir(),
+                               'preview.css'), 'rt') as style:
+            css = style.read()
+        language = html.escape(metadata.get('language', ''))
+        return DOCUMENT.format(language=language,
+                               title=html.escape(metadata.get('title', '')),
+                               style=css,
+                               theme=html.escape(metadata.get('theme', '')),
+                               slides="".join(result))
+
+    def write(self, keynote, filename):
+        """Write the HTML document of a keynote, replacing it atomically."""
+        document = self.render(keynote)
+        keynotec._replace_file(filename, document.encode('utf-8'))
+
+    def render_slide(self, node, number, content, metadata):
+        """Wrap the contents of a slide, with its transition and number."""
+        transition = style = pagenumber = ""
+        if node.transition is not None:
+            transition = " transition-{}".format(node.transition.name)
+            style = ' style="animation-duration: {}s"'.format(
+                node.transition.duration)
+        position = metadata.get('slidenumber', "none none").split()
+        if position and position[0] != "none":
+            pagenumber = '<span class="number {}">{}</span>'.format(
+                html.escape(" ".join(position)), number)
+        return SLIDE.format(number=number,
+                            type=node.type.replace('+', '-'),
+                            transition=transition, style=style,
+                            content=content, pagenumber=pagenumber)
+
+    def image(self, image):
+        """Render an image, found as xelatex would find it."""
+        from urllib.parse import quote
+        from keynotec.images import find_image
+        for directory in (self.srcdir, keynotec.resources_dir()):
+            _, path = find_image(image, directory)
+            if path is not None:
+                image = os.path.relpath(path, self.outdir)
+                break
+        url = quote(image.replace(os.sep, '/'))
+        return '<img src="{}" alt="">'.format(html.escape(url))
+
+    def render_coverpage(self, node, metadata):
+        """Render the cover, from the keynote metadata."""
+        parts = [("h1", "title"), ("p", "subtitle"), ("p", "author"),
+                 ("p", "institute"), ("p", "date")]
+        return "".join(
+            '<{0} class="{1}">{2}</{0}>'.format(tag, key,
+                                                html.escape(metadata[key]))
+            for tag, key in parts if metadata.get(key))
+
+    def render_bigtitle(self, node, metadata):
+        """Render a slide with a big title."""
+        return "<h1>{}</h1>".format(format_html(node.title))
+
+    def render_citation(self, node, metadata):
+        """Render a quote and its author."""
+        return '<blockquote>"{}"</blockquote><p class="author">{}</p>'.format(
+            format_html(node.quote), format_html(node.author))
+
+    def render_images(self, node, metadata):
+        """Render a slide with one, two or four images."""
+        return "".join(self.image(image) for image in node.images)
+
+    def render_code(self, node, metadata):
+        """Render a slide with a code listing."""
+        code = '<pre><code class="language-{}">{}</code></pre>'.format(
+            html.escape(node.language), html.escape(node.code))
+        return render_title(node) + code
+
+    def render_items(self, node, metadata):
+        """Render a slide with a list of items."""
+        return render_title(node) + render_itemlist(node.items)
+
+    def render_itemimage(self, node, metadata):
+        """Render a slide with a list of items beside an image."""
+        image = '<div class="image">{}</div>'.format(
+            self.image(node.images[0]))
+        items = '<div class="items">{}</div>'.format(
+            render_itemlist(node.items))
+        columns = image + items if node.image_side == 'left' \
+            else items + image
+        return render_title(node) + \
+            '<div class="columns">{}</div>'.format(columns)
+
+
+slide_renderers = {
+    'coverpage': Preview.render_coverpage,
+    'bigtitle': Preview.render_bigtitle,
+    'citation': Preview.render_citation,
+    'bigimage': Preview.render_images,
+    'twoimages': Preview.render_images,
+    'fourimages': Preview.render_images,
+    'code': Preview.render_code,
+    'items': Preview.render_items,
+    'items+image': Preview.render_itemimage,
+}
@@ -0,0 +1,165 @@
+"""Record the time and memory used by each phase of a build."""
+
+import contextlib
+import time
+
+# phases run for every slide, reported as a total, with their labels.
+SLIDE_PHASES = (('slide', "slides"), ('render', "rendered slides"))
+
+
+def phase(profiler, name, **args):
+    """Return a context to record a phase, if a profiler is given."""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name, **args)
+
+
+class Profiler:
+    """
+    Collect timing and memory information of a build.
+
+    Phases are recorded with their wall time and the peak memory allocated
+    by Python while they were running (if `memory` is True). For xelatex
+    passes, the largest resident set size of xelatex processes run so far
+    is reported instead. Marks record instant events, like the page markers
+    reported by xelatex.
+    """
+
+    def __init__(self, memory=True):
+        """Initialize the profiler, and start tracing memory if needed."""
+        import threading
+        import tracemalloc
+        self.memory = memory
+        self.start = time.perf_counter()
+        self.phases = []
+        self.marks = []
+        self._local = threading.local()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _now(self):
+        """Return the time, in seconds, since the profiler started."""
+        return time.perf_counter() - self.start
+
+    @contextlib.contextmanager
+    def phase(self, name, **args):
+        """Record the execution of a phase."""
+        import threading
+        import tracemalloc
+        stack = self._local.__dict__.setdefault('stack', [])
+        record = {'name': name, 'args': args, 'peak': 0,
+                  'thread': threading.get_ident()}
+        if self.memory:
+            if stack:
+                parent = stack[-1]
+                parent['peak'] = max(parent['peak'],
+                                     tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stack.append(record)
+        record['start'] = self._now()
+        try:
+            yield record
+        finally:
+            record['duration'] = self._now() - record['start']
+            stack.pop()
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                record['peak'] = max(record['peak'], peak)
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], record['peak'])
+            self.phases.append(record)
+
+    def mark(self, name, **args):
+        """Record an instant event."""
+        import threading
+        self.marks.append({'name': name, 'args': args, 'time': self._now(),
+                           'thread': threading.get_ident()})
+
+    def pages(self):
+        """
+        Compute the time xelatex spent on each page, from page marks.
+
+        Return a list of (pass, page, duration), where the duration of a
+        page is the time since the previous mark (or pass start).
+        """
+        passes = [p for p in self.phases if p['name'] == 'xelatex']
+        pages = []
+        for record in passes:
+            end = record['start'] + record['duration']
+            last = record['start']
+            for mark in self.marks:
+                if mark['name'] != 'page' or \
+                        mark['thread'] != record['thread'] or \
+                        not last <= mark['time'] <= end:
+                    continue
+                pages.append((record['args'].get('pass'),
+                              mark['args']['page'], mark['time'] - last))
+                last = mark['time']
+        return pages
+
+    def report(self, slowest=10):
+        """Return a human readable report of the build."""
+        row = "{:<32} {:>10} {:>12}"
+        lines = [row.format("phase", "seconds", "peak (KB)")]
+        totals = {}
+        for record in sorted(self.phases, key=lambda r: r['start']):
+            name = record['name']
+            if name in dict(SLIDE_PHASES):
+                total = totals.setdefault(name, [0, 0.0, 0])
+                total[0] += 1
+                total[1] += record['duration']
+                total[2] = max(total[2], record['peak'])
+                continue
+            args = record['args']
+            if 'pass' in args:
+                name = "{} pass {}".format(name, args['pass'])
+            if 'part' in args:
+                name = "{} (part {})".format(name, args['part'])
+            if 'xelatex_max_rss' in args:
+                peak = args['xelatex_max_rss'] // 1024
+            else:
+                peak = record['peak'] // 1024 if self.memory else '-'
+            duration = "{:.4f}".format(record['duration'])
+            lines.append(row.format(name, duration, peak))
+        for name, label in SLIDE_PHASES:
+            if name not in totals:
+                continue
+            count, duration, peak = totals[name]
+            name = "{} ({})".format(label, count)
+            peak = peak // 1024 if self.memory else '-'
+            duration = "{:.4f}".format(duration)
+            lines.append(row.format(name, duration, peak))
+        pages = sorted(self.pages(), key=lambda page: -page[2])[:slowest]
+        if pages:
+            lines.append("")
+            lines.append("{:<32} {:>10}".format("slowest slides", "seconds"))
+            for xpass, page, duration in pages:
+                name = "slide {} (pass {})".format(page, xpass)
+                lines.append("{:<32} {:>10.4f}".format(name, duration))
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Return the build events in the Chrome trace event format."""
+        events = []
+        for record in self.phases:
+            args = dict(record['args'])
+            if self.memory:
+                args['peak_bytes'] = record['peak']
+            events.append({
+                'name': record['name'], 'ph': 'X', 'pid': 1,
+                'tid': record['thread'], 'ts': record['start'] * 1e6,
+                'dur': record['duration'] * 1e6, 'args': args,
+            })
+        for mark in self.marks:
+            events.append({
+                'name': mark['name'], 'ph': 'i', 's': 't', 'pid': 1,
+                'tid': mark['thread'], 'ts': mark['time'] * 1e6,
+                'args': mark['args'],
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, filename):
+        """Write the Chrome trace of the build to a JSON file."""
+        import json
+        with open(filename, 'wt') as output:
+            json.dump(self.chrome_trace(), output)
@@ -0,0 +1,225 @@
+"""
+Render parsed slides into LaTeX.
+
+Slides are parsed into nodes (see `keynotec.nodes`), with the slide
+`type`, its `transition`, and the contents of each slide type, with text
+as written in the keynote. Every slide type has a function to render its
+node into the LaTeX code of the slide.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+formatters = {
+    '*': ("\\textbf{", "}"),
+    '/': ('\\textit{', "}"),
+    '_': ('\\underline{', "}"),
+    '|': ('\\texttt{', "}"),
+}
+# escaped characters which are not written as they are.
+escapes = {
+    # keep LaTeX escape for '_'.
+    '_': "\\_",
+}
+formatter_chars = re.compile(r'[*/_|\\]')
+
+transitions = {
+    "dissolve": ("\\transdissolve", 0),
+    "pushright": ("\\transcover", 0),
+    "pushleft": ("\\transcover", 180),
+    "covertop": ("\\transcover", 90),
+    "coverbottom": ("\\transcover", 270),
+}
+
+
+@lru_cache(maxsize=None)
+def listings_languages():
+    """Return the languages with a 'listings' environment on the resources."""
+    import keynotec
+    directory = os.path.join(keynotec.resources_dir(), 'listings')
+    return frozenset(os.path.splitext(name)[0]
+                     for name in os.listdir(directory)
+                     if name.endswith('.tex'))
+
+
+def format_text(value, formatters=formatters, escapes=escapes, text=str):
+    r"""
+    Convert formatted text ([^\\n]|\*[^*]\*|/[^/]/)* into LaTeX.
+
+    Other languages are generated with different `formatters` (the code
+    opening and closing each format) and `escapes`, and a `text` function
+    to escape the text.
+    """
+    result = []
+    active = set()
+    i = 0
+    while True:
+        match = formatter_chars.search(value, i)
+        if match is None:
+            result.append(text(value[i:]))
+            break
+        start = match.start()
+        result.append(text(value[i:start]))
+        char = value[start]
+        if char == "\\":
+            escaped = value[start + 1:start + 2]
+            if escaped in escapes:
+                result.append(escapes[escaped])
+            elif escaped and escaped in formatters or escaped == "\\":
+                result.append(text(escaped))
+            else:
+                result.append(text(value[start:start + 2]))
+            i = start + 2
+        elif char in active:
+            active.remove(char)
+            result.append(formatters[char][1])
+            i = start + 1
+        else:
+            active.add(char)
+            # the character following an opening formatter is not parsed.
+            result.append(formatters[char][0])
+            result.append(text(value[start + 1:start + 2]))
+            i = start + 2
+    return "".join(result)
+
+
+def render_itemlist(items):
+    """Create a multi-level itemize list."""
+    start, end = "\\begin{itemize}", "\\end{itemize}"
+    result = [start]
+    stack = [end]
+    last = 0
+    for item in items:
+        level = item.level
+        if level < last:
+            result.append(stack.pop())
+        elif level > last:
+            stack.append(end)
+            result.append(start)
+        last = level
+        result.append("\\item ")
+        result.append(format_text(item.text))
+    while stack:
+        result.append(stack.pop())
+    return "".join(result)
+
+
+def render_slide(node):
+    """Render a slide node, with its transition."""
+    return wrap_transition(node, slide_renderers[node.type](node))
+
+
+def wrap_transition(node, slide):
+    """Add the transition of a slide node to its LaTeX code, if it has one."""
+    if node.transition is None:
+        return slide
+    transition_text = "{{{transition}[direction={direction}]}}"
+    template = "\\addtobeamertemplate{background canvas}"
+    transition, direction = transitions[node.transition.name]
+    transition_text = transition_text.format(transition=transition,
+                                             direction=direction)
+    return "".join(["{", template, transition_text, "{}", slide, "}"])
+
+
+def render_coverpage(node):
+    """Render the cover, from the keynote metadata."""
+    return '\\coverframe'
+
+
+def render_bigtitle(node):
+    """Render a slide with a big title."""
+    return '\\bigtitle{{{}}}'.format(format_text(node.title))
+
+
+def render_citation(node):
+    """Render a quote and its author."""
+    fmt = '\\citation{{{}}}{{{}}}'
+    return fmt.format(format_text(node.quote or ""),
+                      format_text(node.author))
+
+
+def render_bigimage(node):
+    """Render a slide with a single image."""
+    return '\\bigimage{{{}}}'.format(*node.images)
+
+
+def render_twoimages(node):
+    """Render a slide with two images."""
+    return '\\twoimages{{{}}}{{{}}}'.format(*node.images)
+
+
+def render_fourimages(node):
+    """Render a slide with four images."""
+    return '\\fourimages{{{}}}{{{}}}{{{}}}{{{}}}'.format(*node.images)
+
+
+def render_code(node, listing=None):
+    """
+    Render a slide with a code listing.
+
+    Unless the LaTeX code of the `listing` is given, the code is shown with
+    the 'listings' environment of its language, or as plain code, for
+    languages without one.
+    """
+    frame = """\\begin{{frame}}[fragile]
+        \\frametitle{{{title}}}\n{content}\n\\end{{frame}}
+    """
+    template = """\\begin{{{language}}}\n{code}\n\\end{{{language}}}"""
+    if listing is not None:
+        content = listing
+    elif node.language in listings_languages():
+        content = template.format(language=node.language,
+                                  code=node.code)
+    else:
+        template = "\\begin{{lstlisting}}[basicstyle={{\\footnotesize" \
+                   "\\ttfamily}}]\n{code}\n\\end{{lstlisting}}"
+        content = template.format(code=node.code)
+    return frame.format(title=format_text(node.title or ""),
+                        content=content)
+
+
+def render_items(node):
+    """Render a slide with a list of items."""
+    frame = """\\begin{{frame}}\n\\frametitle{{{title}}}
+               {items}\n\\end{{frame}}\n"""
+    return frame.format(title=format_text(node.title or ""),
+                        items=render_itemlist(node.items))
+
+
+def render_itemimage(node):
+    """Render a slide with a list of items beside an image."""
+    frame = """\\begin{{frame}}[t]
+               \\frametitle{{{title}}}{c}\n\\end{{frame}}\n"""
+    columns = """\\begin{{columns}}{cols}\\end{{columns}}"""
+    column = """
+        \\begin{{column}}{{{size}\\textwidth}}{content}\\end{{column}}
+    """
+    img = """
+        \\begin{{center}}
+        {{\\includegraphics[width=\\textwidth, height=.5\\paperheight,
+        keepaspectratio]{{{i}}}}}
+        \\end{{center}}
+    """
+    cimg = column.format(size=0.45, content=img.format(i=node.images[0]))
+    citems = column.format(size=0.55,
+                           content=render_itemlist(node.items))
+    if node.image_side == 'left':
+        coltext = cimg + citems
+    else:
+        coltext = citems + cimg
+    return frame.format(title=format_text(node.title or ""),
+                        c=columns.format(cols=coltext))
+
+
+slide_renderers = {
+    'coverpage': render_coverpage,
+    'bigtitle': render_bigtitle,
+    'citation': render_citation,
+    'bigimage': render_bigimage,
+    'twoimages': render_twoimages,
+    'fourimages': render_fourimages,
+    'code': render_code,
+    'items': render_items,
+    'items+image': render_itemimage,
+}
@@ -0,0 +1,159 @@
+"""Serve keynote compilations over HTTP, from a pool of warm workers."""
+
+import asyncio
+import json
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import keynotec
+from keynotec.aio import Compiler, CompileError
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """
+    Compile the keynote sent on a POST request, replying with its PDF.
+
+    Replies are 200 with the PDF, 422 with a JSON object with the list of
+    `errors` if the keynote cannot be compiled, 500 with the same object
+    if the compilation fails for another reason (e.g. xelatex is missing),
+    or 503 if the request queue is full.
+    """
+
+    def do_POST(self):
+        """Compile a keynote source."""
+        size = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(size)
+        if not self.server.pending.acquire(blocking=False):
+            self.send_error(503, "Too many requests queued.")
+            return
+        try:
+            pdf = self.server.compile(body.decode('utf-8'))
+        except CompileError as e:
+            self._reply_errors(422, e.errors)
+        except Exception as e:
+            self._reply_errors(500, [str(e)])
+        else:
+            self._reply(200, 'application/pdf', pdf)
+        finally:
+            self.server.pending.release()
+
+    def _reply_errors(self, status, errors):
+        """Send a reply with a JSON object with a list of errors."""
+        self._reply(status, 'application/json',
+                    json.dumps({'errors': errors}).encode('utf-8'))
+
+    def _reply(self, status, content_type, body):
+        """Send a reply with a body."""
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        """Return the client address, for logging."""
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'local'
+
+
+class _Renderer:
+    """Run an asyncio compiler on a thread, for the HTTP servers."""
+
+    # the server is closed, without a renderer, if it fails to bind.
+    loop = None
+    compiler = None
+
+    def setup_renderer(self, jobs, queue, options):
+        """Start the compiler and the event loop running it."""
+        self.options = options
+        self.pending = threading.BoundedSemaphore(
+            (jobs or os.cpu_count() or 1) + queue)
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.compiler = self._submit(self._create_compiler(jobs))
+
+    async def _create_compiler(self, jobs):
+        """Create the compiler, in the event loop it will be used on."""
+        return Compiler(jobs, persistent=True)
+
+    def _submit(self, coroutine):
+        """Run a coroutine in the event loop, waiting for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def compile(self, source):
+        """Compile a keynote source, returning the PDF contents."""
+        # the source is never taken as the path of a file on the server.
+        return self._submit(self.compiler.compile_text(source,
+                                                       **self.options))
+
+    def server_close(self):
+        """Stop the compiler, and close the server."""
+        super().server_close()
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.compiler is not None:
+            self.compiler.close()
+
+
+class RenderServer(_Renderer, ThreadingHTTPServer):
+    """Compile keynotes for HTTP clients."""
+
+    daemon_threads = True
+
+
+class UnixRenderServer(_Renderer, socketserver.ThreadingMixIn,
+                       socketserver.UnixStreamServer):
+    """Compile keynotes for HTTP clients on a Unix socket."""
+
+    daemon_threads = True
+
+
+def warm_up(cache):
+    """Precompile the presentation style of every bundled theme."""
+    from keynotec.parser import Keynote
+    themes_dir = os.path.join(keynotec.resources_dir(), 'themes')
+    themes = [""] + sorted(os.path.splitext(name)[0]
+                           for name in os.listdir(themes_dir)
+                           if name.endswith('.tex'))
+    for theme in themes:
+        keynote = Keynote()
+        keynote.metadata = dict(keynotec.metabase, theme=theme)
+        keynotec._precompiled_format(cache, keynote)
+
+
+def serve(host='127.0.0.1', port=8000, socket=None, jobs=None, queue=16,
+          **options):
+    """
+    Serve keynote compilations over HTTP.
+
+    The server listens on `host` and `port`, or on a Unix `socket` if one is
+    given. Keynotes are compiled by `jobs` workers (by default, the number
+    of CPUs), each one with a working directory kept between builds, and
+    up to `queue` requests wait for a free worker. Further requests are
+    rejected until the queue has room. If a cache is given in `options`,
+    the styles of the bundled themes are precompiled before serving. The
+    `options` are passed to `keynotec.aio.Compiler.compile`. Serving stops
+    on a keyboard interrupt.
+    """
+    if options.get('cache') is not None and options.get('precompile', True):
+        warm_up(options['cache'])
+    if socket is not None:
+        if os.path.exists(socket):
+            os.unlink(socket)
+        server = UnixRenderServer(socket, RenderHandler)
+        print("Serving keynotes on {}".format(socket))
+    else:
+        server = RenderServer((host, port), RenderHandler)
+        print("Serving keynotes on http://{}:{}/".format(host, port))
+    server.setup_renderer(jobs, queue, options)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket is not None and os.path.exists(socket):
+            os.unlink(socket)
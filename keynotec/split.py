@@ -0,0 +1,95 @@
+"""Compile the slides of a keynote as several documents, in parallel."""
+
+import os
+
+import keynotec
+from keynotec import xelatex
+from keynotec.profile import phase
+
+
+def partition(count, parts):
+    """Split `count` slides in at most `parts` contiguous (first, last)."""
+    parts = max(1, min(parts, count))
+    size, extra = divmod(count, parts)
+    ranges = []
+    first = 0
+    for i in range(parts):
+        last = first + size + (1 if i < extra else 0)
+        ranges.append((first, last))
+        first = last
+    return ranges
+
+
+def available():
+    """Return True if split keynotes can be merged ('pypdf' is installed)."""
+    from importlib.util import find_spec
+    return find_spec('pypdf') is not None
+
+
+def merge_pdfs(filenames, output, fullscreen=False):
+    """
+    Merge PDF files, in order, into a single file.
+
+    Pages are copied with their transitions, and the document information of
+    the first file is kept. Requires 'pypdf'.
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        raise Exception("Compiling a split keynote requires 'pypdf'.")
+    writer = PdfWriter()
+    for filename in filenames:
+        writer.append(filename)
+    info = PdfReader(filenames[0]).metadata
+    if info:
+        writer.add_metadata(info)
+    if fullscreen:
+        writer.page_mode = "/FullScreen"
+    with open(output, 'wb') as pdf:
+        writer.write(pdf)
+
+
+def build_parts(keynote, name, parts, max_passes=3, fmt=None, cwd=None,
+                profiler=None, cache=None, **options):
+    """
+    Compile a keynote as `parts` documents in parallel into `name`.pdf.
+
+    Every document has the same preamble as the whole keynote, and starts
+    its page and frame counters where the previous document ended, as every
+    slide is typeset in a single page. Highlighted code is reused from the
+    `cache`, if one is given. The `options` are passed to
+    `keynotec.xelatex.run`. Return True if any document had errors, in
+    which case no PDF is generated.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    # fail before compiling the parts, if they cannot be merged.
+    if not available():
+        raise Exception("Compiling a split keynote requires 'pypdf'.")
+    ranges = partition(len(keynote.nodes), parts)
+    names = ['{}-part{}'.format(name, i + 1) for i in range(len(ranges))]
+
+    def compile_part(i):
+        texfile = '{}.tex'.format(names[i])
+        with open(texfile, 'wt') as output:
+            first, last = ranges[i]
+            keynotec._generate_tex(keynote, output, fmt is None, first, last,
+                                   cache=cache)
+        return xelatex.run_passes(texfile, max_passes, fmt, cwd, profiler,
+                                  i + 1, **options)
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        error = any(executor.map(compile_part, range(len(ranges))))
+    if not error:
+        with phase(profiler, 'merge'):
+            merge_pdfs(['{}.pdf'.format(part) for part in names],
+                       '{}.pdf'.format(name),
+                       bool(keynote.metadata.get('fullscreen', False)))
+
+    # auxiliary files are kept, so that the parts converge faster.
+    exts = ['log', 'vrb', 'pdf'] if error else ['log', 'vrb', 'pdf', 'tex']
+    for part in names:
+        for ext in exts:
+            fname = '{}.{}'.format(part, ext)
+            if os.access(fname, os.F_OK):
+                os.unlink(fname)
+    return error
@@ -0,0 +1,101 @@
+"""Rebuild a keynote whenever its sources change."""
+
+import os
+import shutil
+import time
+
+import keynotec
+from keynotec import workspace
+
+
+def _sources_signature(filename, images):
+    """Return a value that changes whenever a keynote source changes."""
+    from keynotec.cache import file_signature, tree_signature
+    srcdir = os.path.dirname(os.path.abspath(filename))
+    themes_dir = os.path.join(keynotec.resources_dir(), 'themes')
+    signature = [file_signature(filename), tree_signature(themes_dir)]
+    return signature + keynotec._image_signatures(images, srcdir)
+
+
+def _wait_for_change(filename, images, interval, delay):
+    """Wait until sources change, and then stay unchanged for `delay`."""
+    signature = _sources_signature(filename, images)
+    current = signature
+    while current == signature:
+        time.sleep(interval)
+        current = _sources_signature(filename, images)
+    # wait for a burst of changes (e.g. many saves) to end.
+    while current != signature:
+        time.sleep(delay)
+        signature, current = current, _sources_signature(filename, images)
+
+
+def _write_preview(filename, preview, document, images):
+    """
+    Write the HTML preview of a keynote, rendering the changed slides.
+
+    `document` is the `keynotec.incremental.Document` of the last version
+    of the keynote, and only the slides that changed are parsed again. The
+    `images` set is replaced by the images used by the keynote.
+    """
+    with open(filename, 'rt') as datafile:
+        changes = document.update(datafile.read())
+    keynote = document.keynote()
+    images.clear()
+    images.update(keynote.images)
+    keynotec._default_metadata(keynote)
+    name, _ = os.path.splitext(filename)
+    preview.write(keynote, '{}.html'.format(name))
+    print("{}.html generated ({} changes, {} of {} slides rendered).".format(
+        name, len(changes), preview.rendered, len(keynote.nodes)))
+
+
+def watch(filename, interval=0.25, delay=0.3, html=False, **options):
+    """
+    Build a keynote, and build it again whenever its sources change.
+
+    The keynote file, the images used by the slides and the theme files are
+    checked every `interval` seconds, and a build starts after they stay
+    unchanged for `delay` seconds. Intermediate files are kept on a private
+    workspace between builds (see `keynotec.workspace`), so a rebuild
+    usually needs a single xelatex pass, and the PDF is replaced
+    atomically. The `options` are passed to `keynotec.build`. Watching
+    stops on a keyboard interrupt.
+
+    If `html` is True, an HTML preview is written instead of the PDF (see
+    `keynotec.preview`), and only the slides that changed are parsed (see
+    `keynotec.incremental`) and rendered again.
+    """
+    workdir = None
+    images = set()
+    preview = None
+    if html:
+        from keynotec.incremental import Document
+        from keynotec.preview import Preview
+        preview = Preview(os.path.dirname(os.path.abspath(filename)))
+        document = Document("")
+    else:
+        workdir = workspace.create()
+    try:
+        while True:
+            start = time.perf_counter()
+            # the images are only replaced once the keynote is parsed, so
+            # the last known images are watched on invalid keynotes.
+            try:
+                if preview is None:
+                    keynotec.build(filename, workdir=workdir, images=images,
+                                   **options)
+                else:
+                    _write_preview(filename, preview, document, images)
+            except Exception as e:
+                print(e)
+            elapsed = time.perf_counter() - start
+            print("Finished in {:.2f}s. Waiting for changes.".format(elapsed))
+            _wait_for_change(filename, images, interval, delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if workdir is not None and options.get('keep_artifacts'):
+            print("Intermediate files kept at {}".format(workdir))
+        elif workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
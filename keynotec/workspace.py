@@ -0,0 +1,79 @@
+"""
+Private scratch directories where keynotes are built.
+
+Intermediate files are written to a workspace on a memory-backed file
+system, when there is one, instead of next to the keynote, so builds do not
+wait on slow (e.g. network) file systems, and builds of the same keynote
+running at the same time do not share files. The auxiliary files xelatex
+reads back are kept on the cache between builds.
+"""
+
+import json
+import os
+import tempfile
+
+# memory-backed file systems, used for workspaces if they are writable.
+SCRATCH_DIRS = ['/dev/shm']
+
+
+def scratch_directory():
+    """
+    Return the directory workspaces are created on.
+
+    It is KEYNOTEC_SCRATCH_DIR, if it is set, or the first writable
+    directory of SCRATCH_DIRS, or None, for the system temporary directory.
+    """
+    directory = os.environ.get('KEYNOTEC_SCRATCH_DIR')
+    if directory:
+        return directory
+    for directory in SCRATCH_DIRS:
+        if os.path.isdir(directory) and \
+                os.access(directory, os.W_OK | os.X_OK):
+            return directory
+    return None
+
+
+def create():
+    """Create a private workspace, returning its path."""
+    return tempfile.mkdtemp(prefix='keynotec-', dir=scratch_directory())
+
+
+def _state_key(cache, filename):
+    """Return the cache key of the auxiliary files of a keynote."""
+    return cache.key('auxiliary', os.path.abspath(filename))
+
+
+def restore_state(cache, filename, workdir):
+    """
+    Copy the auxiliary files of the last build of a keynote to `workdir`.
+
+    Files that are already on `workdir` are kept. Return the number of
+    files copied.
+    """
+    entry = cache.get(_state_key(cache, filename))
+    if entry is None:
+        return 0
+    count = 0
+    for name, data in json.loads(entry.decode('utf-8')).items():
+        path = os.path.join(workdir, os.path.basename(name))
+        if not os.access(path, os.F_OK):
+            with open(path, 'wb') as aux:
+                aux.write(data.encode('latin-1'))
+            count += 1
+    return count
+
+
+def save_state(cache, filename, workdir):
+    """Store on the cache the auxiliary files of a keynote, on `workdir`."""
+    from keynotec.xelatex import AUXILIARY_EXTENSIONS
+    state = {}
+    for name in sorted(os.listdir(workdir)):
+        if os.path.splitext(name)[1][1:] in AUXILIARY_EXTENSIONS:
+            with open(os.path.join(workdir, name), 'rb') as aux:
+                state[name] = aux.read().decode('latin-1')
+    if not state:
+        return
+    key = _state_key(cache, filename)
+    data = json.dumps(state, sort_keys=True).encode('utf-8')
+    if cache.get(key) != data:
+        cache.put(key, data)
@@ -0,0 +1,165 @@
+"""Run xelatex, reporting its progress while it runs."""
+
+import os
+import re
+import time
+
+import keynotec
+from keynotec.profile import phase
+
+# Files written by xelatex that are read back on the next pass.
+AUXILIARY_EXTENSIONS = ['aux', 'nav', 'out', 'snm', 'toc']
+
+page_marker = re.compile(r'\[(\d+)\]')
+
+
+def environment(fmt=None, images=None):
+    """
+    Create the environment variables used to run xelatex.
+
+    If an `images` directory is given, images are searched on it first.
+    """
+    env = dict(os.environ)
+    env['TEXINPUTS'] = keynotec.resources_dir() + "//:"
+    if images is not None:
+        env['TEXINPUTS'] = images + ":" + env['TEXINPUTS']
+    if fmt is not None:
+        env['TEXFORMATS'] = os.path.dirname(fmt) + ":"
+    return env
+
+
+def command(texfile, fmt=None, cwd=None, fail_fast=False):
+    """
+    Return the xelatex command line, and the directory to run it on.
+
+    xelatex runs on `cwd` (by default, the directory of the LaTeX file), so
+    that builds do not depend on (or change) the process working directory.
+    """
+    outdir, texname = os.path.split(os.path.abspath(texfile))
+    cwd = outdir if cwd is None else os.path.abspath(cwd)
+    cmd = ['xelatex', '-interaction', 'nonstopmode']
+    if fail_fast:
+        cmd.append('-halt-on-error')
+    if fmt is not None:
+        cmd.append('-fmt={}'.format(os.path.basename(fmt)[:-len('.fmt')]))
+    if cwd != outdir:
+        cmd.append('-output-directory={}'.format(outdir))
+        texname = os.path.abspath(texfile)
+    cmd.append(texname)
+    return cmd, cwd
+
+
+def print_progress(page):
+    """Report that xelatex typeset a page."""
+    print("Processing slide {}".format(page))
+
+
+def _read_lines(stream, lines):
+    """Move the lines read from a stream to a queue, ending with None."""
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+def run(texfile, fmt=None, cwd=None, profiler=None, timeout=None,
+        fail_fast=False, progress=print_progress, images=None):
+    """
+    Run xelatex once, returning True if it reported errors.
+
+    The output of xelatex is processed as it is produced: error messages
+    are printed, and `progress` is called with the number of every page
+    typeset. If `fail_fast` is True, xelatex is stopped on the first error.
+    If xelatex runs longer than `timeout` seconds, it is killed and an
+    exception is raised. Images are searched first on the `images`
+    directory, if one is given.
+    """
+    import queue
+    import threading
+    from subprocess import Popen, PIPE, STDOUT
+    cmd, cwd = command(texfile, fmt, cwd, fail_fast)
+    proc = Popen(cmd, stdout=PIPE, stderr=STDOUT, cwd=cwd,
+                 universal_newlines=True, env=environment(fmt, images))
+    lines = queue.Queue()
+    reader = threading.Thread(target=_read_lines, args=(proc.stdout, lines),
+                              daemon=True)
+    reader.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    error = False
+    finished = False
+    try:
+        while True:
+            wait = None
+            if deadline is not None:
+                wait = max(0, deadline - time.monotonic())
+            try:
+                line = lines.get(timeout=wait)
+            except queue.Empty:
+                message = "xelatex did not finish in {} seconds."
+                raise Exception(message.format(timeout))
+            if line is None:
+                finished = True
+                break
+            line = line.rstrip('\n')
+            if line and line[0] == '!':
+                error = True
+                print(line)
+                if fail_fast:
+                    break
+            for page in page_marker.findall(line):
+                if profiler is not None:
+                    profiler.mark('page', page=int(page))
+                if progress is not None:
+                    progress(int(page))
+    finally:
+        if not finished:
+            proc.kill()
+        proc.wait()
+    return error
+
+
+def auxiliary_state(name):
+    """Return the contents digest of the auxiliary files of a document."""
+    import hashlib
+    state = []
+    for ext in AUXILIARY_EXTENSIONS:
+        try:
+            with open('{}.{}'.format(name, ext), 'rb') as aux:
+                state.append(hashlib.sha256(aux.read()).digest())
+        except OSError:
+            state.append(None)
+    return state
+
+
+def children_max_rss():
+    """Return the largest resident set size of child processes, in bytes."""
+    import resource
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+
+def run_passes(texfile, max_passes=3, fmt=None, cwd=None, profiler=None,
+               part=None, **options):
+    """
+    Run xelatex until the auxiliary files converge.
+
+    Auxiliary files from previous builds are reused, so if the document
+    did not change its references, a single pass is enough. The `options`
+    are passed to `run`. Return True if xelatex reported errors.
+    """
+    name, _ = os.path.splitext(texfile)
+    state = auxiliary_state(name)
+    error = False
+    args = {} if part is None else {'part': part}
+    for count in range(max_passes):
+        if count == 0:
+            print("Creating slides.")
+        else:
+            print("Fixing references and effects.")
+        args['pass'] = count + 1
+        with phase(profiler, 'xelatex', **args) as record:
+            error |= run(texfile, fmt, cwd, profiler, **options)
+        if record is not None:
+            record['args']['xelatex_max_rss'] = children_max_rss()
+        previous, state = state, auxiliary_state(name)
+        if error or state == previous:
+            break
+    return error
@@ -14,6 +14,7 @@ setup(
     version="0.2.2",
     packages=find_packages(),
     platforms=['any'],
+    python_requires='>=3.9',
     # scripts=['keynotec'],
     package_data={
         'keynotec': ['keynotec/resources'],
@@ -31,4 +32,9 @@ setup(
         'console_scripts': ['keynotec = keynotec:run']
     },
     include_package_data=True,
+    extras_require={
+        'split': ['pypdf'],
+        'images': ['Pillow'],
+        'highlight': ['Pygments'],
+    },
 )